@@ -0,0 +1,52 @@
+import argparse
+import sys
+
+from benchmarks.compare import DEFAULT_THRESHOLD, compare_results, format_comparison
+from benchmarks.runner import DEFAULT_SIZES, load_results, run_benchmarks, save_results
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmarks of YADA's hot paths.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="generate data, time every case and save the results")
+    run.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES),
+                     help="numbers of contacts and notes to generate, e.g. 1000 1000000")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--only", nargs="+", help="run only the cases whose names contain one of these strings")
+    run.add_argument("--output", default="benchmark-results.json")
+    run.add_argument("--baseline", help="results file to compare the new results against")
+    run.add_argument("--metric", default="p50_us")
+    run.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+
+    compare = commands.add_parser("compare", help="compare two results files")
+    compare.add_argument("current")
+    compare.add_argument("baseline")
+    compare.add_argument("--metric", default="p50_us")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    return parser.parse_args(argv)
+
+
+def _compare(current, baseline, metric, threshold) -> int:
+    rows = compare_results(current, baseline, metric, threshold)
+    print(format_comparison(rows))
+    regressions = sum(1 for row in rows if row[-1])
+    print(f"{regressions} regressions over {threshold}x in {metric}.")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    options = parse_arguments(argv)
+    if options.command == "compare":
+        return _compare(load_results(options.current), load_results(options.baseline),
+                        options.metric, options.threshold)
+    results = run_benchmarks(options.sizes, options.seed, options.only)
+    save_results(results, options.output)
+    print(f"Results saved to {options.output}.")
+    if options.baseline:
+        return _compare(results, load_results(options.baseline), options.metric, options.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
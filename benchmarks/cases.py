@@ -0,0 +1,101 @@
+import io
+import random
+from contextlib import redirect_stdout
+
+from benchmarks.generators import STREETS, TAGS, WORDS, generate_address_book, generate_record, write_notes_file
+from yada.birthday_reminder import get_birthdays_per_week
+from yada.journal import commit_journal, write_snapshot
+from yada.notebook import NOTES_FILE_NAME, Notebook
+from yada.storage import read_snapshot
+
+# Calls timed per case, unless the case sets its own number.
+DEFAULT_CALLS = 1000
+# Whole-file operations get far fewer calls.
+IO_CALLS = 3
+
+SNAPSHOT_PATH = "data"
+JOURNAL_SNAPSHOT_PATH = "journaled"
+
+
+class Fixture:
+    """
+    The data every case of one size works on: a generated address book, a notes file and a notebook loaded from it.
+    Must be created in the working directory of the run, since the notebook uses the notes file from there.
+    """
+
+    def __init__(self, size: int, seed: int):
+        self.size = size
+        self.contacts = generate_address_book(size, seed)
+        write_notes_file(NOTES_FILE_NAME, size, seed)
+        self.notebook = Notebook()
+        write_snapshot(self.contacts, SNAPSHOT_PATH)
+        write_snapshot(self.contacts, JOURNAL_SNAPSHOT_PATH)
+        rng = random.Random(seed)
+        sample = [self.contacts[name] for name in rng.sample(list(self.contacts), min(size, 1000))]
+        self.names = [record.name.value for record in sample]
+        self.phones = [record.phones[0].value for record in sample]
+        self.emails = [record.emails[0].value for record in sample if record.emails] or ["nobody@example.org"]
+        self.birthdays = [record.birthday.value for record in sample if record.birthday != "Unknown"]
+        self.cities = [record.addresses[0].city for record in sample if record.addresses]
+        self.next_id = size
+
+
+class Case:
+    """
+    One timed operation. run(fixture, rng) performs a single call.
+    """
+
+    def __init__(self, name: str, run, calls: int = DEFAULT_CALLS):
+        self.name = name
+        self.run = run
+        self.calls = calls
+
+
+def _add_record(fixture, rng):
+    fixture.contacts.add_record(generate_record(fixture.next_id, rng))
+    fixture.next_id += 1
+
+
+def _find_fuzzy(fixture, rng):
+    name = rng.choice(fixture.names)
+    position = rng.randrange(len(name))
+    fixture.contacts.find_fuzzy(name[:position] + "x" + name[position + 1:])
+
+
+def _commit_one_change(fixture, rng):
+    record = fixture.contacts[rng.choice(fixture.names)]
+    record.add_phone(f"06{rng.randrange(10 ** 8):08d}")
+    commit_journal(fixture.contacts, JOURNAL_SNAPSHOT_PATH)
+
+
+def _birthdays_per_week(fixture, rng):
+    with redirect_stdout(io.StringIO()):
+        get_birthdays_per_week([], fixture.contacts)
+
+
+def _save_notes(fixture, rng):
+    fixture.notebook.save_notes()
+
+
+CASES = [
+    Case("address_book.find", lambda f, rng: f.contacts.find(rng.choice(f.names))),
+    Case("address_book.find_fuzzy", _find_fuzzy, calls=100),
+    Case("address_book.find_by_phone", lambda f, rng: f.contacts.find_by_phone(rng.choice(f.phones))),
+    Case("address_book.find_by_email", lambda f, rng: f.contacts.find_by_email(rng.choice(f.emails))),
+    Case("address_book.find_by_birthday", lambda f, rng: f.contacts.find_by_birthday(rng.choice(f.birthdays))),
+    Case("address_book.find_by_address.city",
+         lambda f, rng: f.contacts.find_by_address(city=rng.choice(f.cities)), calls=100),
+    Case("address_book.find_by_address.street_prefix",
+         lambda f, rng: f.contacts.find_by_address(street=rng.choice(STREETS)[:3], prefix=True), calls=100),
+    Case("address_book.upcoming_birthdays", lambda f, rng: f.contacts.upcoming_birthdays(7), calls=100),
+    Case("address_book.add_record", _add_record),
+    Case("birthday_reminder.get_birthdays_per_week", _birthdays_per_week, calls=100),
+    Case("storage.write_snapshot", lambda f, rng: write_snapshot(f.contacts, SNAPSHOT_PATH), calls=IO_CALLS),
+    Case("storage.read_snapshot", lambda f, rng: read_snapshot(SNAPSHOT_PATH), calls=IO_CALLS),
+    Case("journal.commit_one_change", _commit_one_change),
+    Case("notebook.load_notes", lambda f, rng: Notebook(), calls=IO_CALLS),
+    Case("notebook.save_notes", _save_notes, calls=IO_CALLS),
+    Case("notebook.search_text", lambda f, rng: f.notebook.search_text(rng.choice(WORDS)[1:5]), calls=100),
+    Case("notebook.search_tags", lambda f, rng: f.notebook.search_tags(rng.sample(TAGS, 2)), calls=100),
+    Case("notebook.tag_counts", lambda f, rng: f.notebook.tag_counts()),
+]
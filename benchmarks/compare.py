@@ -0,0 +1,38 @@
+DEFAULT_THRESHOLD = 1.25
+# Latencies this small are dominated by noise and are never reported as regressions.
+NOISE_FLOOR_US = 5.0
+
+
+def compare_results(current: dict, baseline: dict, metric: str = "p50_us", threshold: float = DEFAULT_THRESHOLD):
+    """
+    Compares two result files case by case.
+    :param current: results of the new run.
+    :param baseline: stored results to compare against.
+    :param metric: latency field to compare, e.g. "p50_us" or "p99_us".
+    :param threshold: ratio current / baseline above which a case counts as a regression.
+    :return list of (case, size, baseline value, current value, ratio, regressed) tuples:
+    """
+    baseline_values = {(result["case"], result["size"]): result[metric] for result in baseline["results"]}
+    rows = []
+    for result in current["results"]:
+        key = (result["case"], result["size"])
+        if key not in baseline_values:
+            continue
+        old, new = baseline_values[key], result[metric]
+        ratio = new / old if old else float("inf")
+        regressed = ratio > threshold and new - old > NOISE_FLOOR_US
+        rows.append((result["case"], result["size"], old, new, ratio, regressed))
+    return rows
+
+
+def format_comparison(rows) -> str:
+    """
+    Formats the comparison as a plain text table.
+    :param rows: result of compare_results.
+    :return str:
+    """
+    lines = [f"{'case':<45} {'size':>8} {'baseline us':>13} {'current us':>13} {'ratio':>7}"]
+    for case, size, old, new, ratio, regressed in rows:
+        mark = "  REGRESSION" if regressed else ""
+        lines.append(f"{case:<45} {size:>8} {old:>13.1f} {new:>13.1f} {ratio:>7.2f}{mark}")
+    return "\n".join(lines)
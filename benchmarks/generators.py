@@ -0,0 +1,109 @@
+import random
+from datetime import date, timedelta
+
+from yada.address_book import Address, AddressBook, Birthday, Email, Phone, Record
+from yada.notebook import Note, format_note
+
+FIRST_NAMES = ("olena", "andrii", "iryna", "dmytro", "oksana", "taras", "kateryna", "yevhen", "mariia", "bohdan",
+               "sofiia", "mykola", "anna", "serhii", "yuliia", "ivan")
+LAST_NAMES = ("shevchenko", "kovalenko", "bondarenko", "tkachenko", "kravchenko", "melnyk", "boiko", "koval",
+              "lysenko", "marchenko", "rudenko", "savchenko", "petrenko", "havrysh", "balakin", "lozinsky")
+COUNTRIES = {
+    "ukraine": ("kyiv", "lviv", "odesa", "kharkiv", "dnipro", "vinnytsia"),
+    "poland": ("warsaw", "krakow", "wroclaw"),
+    "germany": ("berlin", "munich"),
+}
+STREETS = ("main", "shevchenka", "franka", "lesi ukrainky", "sadova", "hrushevskoho", "zelena", "naberezhna",
+           "soborna", "kyivska")
+WORDS = ("meeting", "call", "buy", "milk", "project", "deadline", "review", "python", "index", "report", "birthday",
+         "gift", "travel", "ticket", "doctor", "invoice", "friday", "weekend", "garden", "book", "code", "release",
+         "budget", "plan", "coffee", "train", "lecture", "homework", "music", "concert")
+TAGS = ("work", "home", "urgent", "ideas", "shopping", "family", "study", "health", "finance", "travel")
+EMAIL_DOMAINS = ("gmail.com", "ukr.net", "example.org")
+
+_FIRST_BIRTHDAY = date(1950, 1, 1)
+_BIRTHDAY_RANGE = (date(2005, 12, 31) - _FIRST_BIRTHDAY).days
+
+
+def contact_name(i: int) -> str:
+    """
+    Returns the unique name of the i-th generated contact.
+    :param i:
+    :return name:
+    """
+    return f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]} {i}"
+
+
+def generate_record(i: int, rng: random.Random) -> Record:
+    """
+    Builds one contact with one or two phones, usually an email, a birthday and an address.
+    The values are valid by construction, so they are not validated again.
+    :param i: number of the contact, makes the name, phone and email unique.
+    :param rng:
+    :return Record:
+    """
+    record = Record(contact_name(i))
+    record.phones = [Phone.from_valid(f"05{i:08d}")]
+    if rng.random() < 0.5:
+        record.phones.append(Phone.from_valid(f"+3809{rng.randrange(10 ** 8):08d}"))
+    if rng.random() < 0.8:
+        record.emails = [Email.from_valid(f"user{i}@{rng.choice(EMAIL_DOMAINS)}")]
+    if rng.random() < 0.9:
+        day = _FIRST_BIRTHDAY + timedelta(days=rng.randrange(_BIRTHDAY_RANGE))
+        record.birthday = Birthday.from_valid(day.strftime("%d.%m.%Y"), birthday=day)
+    if rng.random() < 0.7:
+        country = rng.choice(list(COUNTRIES))
+        record.addresses = [Address(country, rng.choice(COUNTRIES[country]), rng.choice(STREETS),
+                                    str(rng.randrange(1, 200)))]
+    return record
+
+
+def generate_address_book(size: int, seed: int = 0) -> AddressBook:
+    """
+    Builds an address book with the given number of contacts. The same seed gives the same book.
+    :param size:
+    :param seed:
+    :return AddressBook:
+    """
+    rng = random.Random(seed)
+    contacts = AddressBook()
+    for i in range(size):
+        contacts.add_record(generate_record(i, rng))
+    contacts.pop_changes()
+    return contacts
+
+
+def generate_note(note_id: int, rng: random.Random) -> Note:
+    """
+    Builds a note of 3 to 12 words with up to three tags.
+    :param note_id:
+    :param rng:
+    :return Note:
+    """
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+    return Note(text, note_id, rng.sample(TAGS, rng.randint(0, 3)))
+
+
+def generate_notes(size: int, seed: int = 0):
+    """
+    Yields the given number of notes. The same seed gives the same notes.
+    :param size:
+    :param seed:
+    :return generator of Note:
+    """
+    rng = random.Random(seed)
+    for note_id in range(1, size + 1):
+        yield generate_note(note_id, rng)
+
+
+def write_notes_file(path: str, size: int, seed: int = 0):
+    """
+    Writes generated notes in the format of the notes file.
+    :param path:
+    :param size:
+    :param seed:
+    :return None:
+    """
+    with open(path, "w") as file:
+        for note in generate_notes(size, seed):
+            file.write(format_note(note))
@@ -0,0 +1,136 @@
+import gc
+import json
+import math
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from benchmarks.cases import CASES, Fixture
+
+DEFAULT_SIZES = (1000, 10000, 100000)
+RESULTS_VERSION = 1
+
+
+def percentile(sorted_values: list, percent: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values.
+    :param sorted_values:
+    :param percent: 0-100.
+    :return value:
+    """
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+@contextmanager
+def working_directory():
+    """
+    Runs the block in a fresh temporary directory, so the data and notes files of the user are never touched.
+    :return path of the directory:
+    """
+    previous = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="yada-bench-") as path:
+        os.chdir(path)
+        try:
+            yield path
+        finally:
+            os.chdir(previous)
+
+
+def measure_case(case, fixture, seed: int) -> dict:
+    """
+    Times case.calls calls of one case after a warm-up call, then measures the peak memory of one more call.
+    :param case:
+    :param fixture:
+    :param seed:
+    :return result dict:
+    """
+    rng = random.Random(seed)
+    case.run(fixture, rng)
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(case.calls):
+            start = time.perf_counter_ns()
+            case.run(fixture, rng)
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        case.run(fixture, rng)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    timings.sort()
+    total = sum(timings)
+    return {
+        "case": case.name,
+        "size": fixture.size,
+        "calls": len(timings),
+        "throughput_per_s": len(timings) / (total / 1e9) if total else None,
+        "mean_us": total / len(timings) / 1e3,
+        "p50_us": percentile(timings, 50) / 1e3,
+        "p95_us": percentile(timings, 95) / 1e3,
+        "p99_us": percentile(timings, 99) / 1e3,
+        "max_us": timings[-1] / 1e3,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, seed: int = 0, only=None, report=print) -> dict:
+    """
+    Runs every case on generated data of every size.
+    Cases whose optional dependencies are missing are recorded as skipped.
+    :param sizes: numbers of contacts and notes.
+    :param seed: seed of the generators and of the query choice.
+    :param only: substrings of case names to run, all cases by default.
+    :param report: called with a line of progress for every case.
+    :return results dict ready to be saved as JSON:
+    """
+    cases = [case for case in CASES if not only or any(part in case.name for part in only)]
+    results = []
+    skipped = []
+    for size in sizes:
+        with working_directory():
+            start = time.perf_counter()
+            fixture = Fixture(size, seed)
+            report(f"size {size}: generated in {time.perf_counter() - start:.1f} s")
+            for case in cases:
+                try:
+                    result = measure_case(case, fixture, seed)
+                except ImportError as error:
+                    skipped.append({"case": case.name, "size": size, "reason": str(error)})
+                    report(f"  {case.name:<45} skipped: {error}")
+                    continue
+                results.append(result)
+                report(f"  {case.name:<45} p50 {result['p50_us']:>12.1f} us  p99 {result['p99_us']:>12.1f} us"
+                       f"  peak {result['peak_memory_bytes'] / 1024:>10.1f} KiB")
+            del fixture
+    return {
+        "version": RESULTS_VERSION,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "sizes": list(sizes),
+        "results": results,
+        "skipped": skipped,
+    }
+
+
+def save_results(results: dict, path: str):
+    with open(path, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
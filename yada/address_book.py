@@ -1,6 +1,14 @@
 from collections import UserDict
-from datetime import date
-import re
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+
+from yada.indexes import AddressIndex, BirthdayIndex, NameIndex, PrefixTrie, RecordIndex
+from yada.profiling import profiler
+from yada.validation import normalize_phone, validate_birthday, validate_email, validate_phone
+
+# Names farther than this many typos from a fuzzy query are never suggested.
+FUZZY_MAX_DISTANCE = 2
 
 
 # Colors
@@ -20,37 +28,49 @@ class Color:
     WHITE_BOLD = "\033[97;1m"
 
 
-def data_validator(func):
+@lru_cache(maxsize=None)
+def stored_attributes(cls) -> tuple:
     """
-    Wrapper function.
-    Validates a phone number and birthday date in special format.
-    :param func:
-    :return wrapper:
+    Returns the slot names of a class that hold data, leaving out the ones replaced by properties.
+    :param cls:
+    :return tuple of attribute names:
     """
+    names = []
+    for klass in reversed(cls.__mro__):
+        for name in klass.__dict__.get("__slots__", ()):
+            if name not in names and not isinstance(getattr(cls, name, None), property):
+                names.append(name)
+    return tuple(names)
 
-    def inner(*args, **kwargs):
-        """
-        Handles exception "ValueError" if the phone number or birthday is in incorrect format.
-        :param args:
-        :param kwargs:
-        :return None:
-        """
-        try:
-            func(*args, **kwargs)
-        except ValueError:
-            if func.__name__ == "add_birthday":
-                print(f"{Color.RED}Birthday date must in this format 'DD.MM.YYYY'\n{Color.RESET}")
-            else:
-                print(f"{Color.RED}Phone number must be 10 digits long\n{Color.RESET}")
 
-    return inner
+class Slotted:
+    """
+    Base class for compact model objects stored in slots.
+    Pickles its slots as a dict, and also loads dicts pickled before the class had slots,
+    ignoring attributes that are now computed.
+    """
+
+    __slots__ = ()
 
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in stored_attributes(type(self)) if hasattr(self, name)}
 
-class Field:
+    def __setstate__(self, state):
+        if isinstance(state, tuple):
+            dict_state, slots_state = state
+            state = dict(dict_state or {}, **(slots_state or {}))
+        for name in stored_attributes(type(self)):
+            if name in state:
+                setattr(self, name, state[name])
+
+
+class Field(Slotted):
     """
     Base class for record fields.
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, value: str):
         """
         Initializes a Field object with a given value.
@@ -58,6 +78,20 @@ class Field:
         """
         self.value = value
 
+    @classmethod
+    def from_valid(cls, value: str, **attributes):
+        """
+        Builds a field from an already validated value without validating it again.
+        :param value:
+        :param attributes: other slots to set, e.g. the parsed birthday date.
+        :return field object:
+        """
+        field = cls.__new__(cls)
+        field.value = value
+        for name, attribute in attributes.items():
+            setattr(field, name, attribute)
+        return field
+
     def __str__(self):
         """
         Returns the string representation of the field value.
@@ -71,9 +105,11 @@ class Name(Field):
     Class to store contact names. Mandatory field.
     """
 
-    def __init__(self, value: str):
-        super().__init__(value)
-        self.name = value
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.value
 
 
 class Phone(Field):
@@ -82,83 +118,108 @@ class Phone(Field):
     validate_phone_number function for thr required format (10 digits).
     """
 
+    __slots__ = ()
+
     def __init__(self, value: str):
         """
         Initializes a Phone object with a given value.
         :param value:
         """
         super().__init__(value)
-        self.phone = self.validate_phone_number()
+        self.validate_phone_number()
+
+    @property
+    def phone(self):
+        return self.value
 
     def validate_phone_number(self):
         """
         Validates the required format (10 digits) of the phone number.
-        :return: Raises "ValueError" if the phone number format is invalid.
+        :return: Raises "ValidationError" if the phone number format is invalid.
         """
-        if re.findall(r'^\d{10}$', str(self.value.replace('+38', ''))):
-            print(f"{Color.GREEN}Contacts updated.\n{Color.RESET}")
-            return self.value
-        else:
-            raise ValueError(f"{Color.RED}Phone number must be 10 digits long.\n{Color.RESET}")
+        return validate_phone(self.value)
 
 
 class Birthday(Field):
+    __slots__ = ("birthday",)
+
     def __init__(self, value: str):
         super().__init__(value)
         self.birthday = self.validate_birthday()
 
     def validate_birthday(self):
-        date_pattern = re.compile(r'^\d{2}\.\d{2}\.\d{4}$')
         """
         Validates the required format (DD.MM.YYYY) of the birthday date.
-        :return: Raises "ValueError" if the birthday date format is invalid.
+        :return: the date. Raises "ValidationError" if the birthday date format is invalid.
         """
-        if date_pattern.match(self.value):
-            day, month, year = self.value.split(".")
-            if int(day) <= 31 and int(month) <= 12:
-                print(f"{Color.GREEN}Birthday added.{Color.RESET}\n")
-                return date(int(year), int(month), int(day))
-            print(f"{Color.RED}Birthday date must in this format DD.MM.YYYY\n{Color.RESET}")
-        else:
-            raise ValueError(f"{Color.RED}Birthday date must in this format 'DD.MM.YYYY'{Color.RESET}")
+        return validate_birthday(self.value)
 
 
 class Address(Field):
+    """
+    Class to store addresses. The formatted value is built from the parts when needed.
+    """
+
+    __slots__ = ("country", "city", "street", "house_number")
+
     def __init__(self, country: str, city: str, street: str, house_number: str):
-        super().__init__(f"Country: {country}, City: {city}, Street: {street}, House_Number: {house_number}")
         self.country = country
         self.city = city
         self.street = street
         self.house_number = house_number
 
-    def __str__(self):
+    @property
+    def value(self):
         return f"Country: {self.country}, City: {self.city}, Street: {self.street}, House_Number: {self.house_number}"
 
+    def __str__(self):
+        return self.value
+
+    def matches(self, country=None, city=None, street=None, prefix=False) -> bool:
+        """
+        Checks the address against a query in the same way AddressIndex.find does.
+        :param country:
+        :param city:
+        :param street:
+        :param prefix:
+        :return True if every given part matches:
+        """
+        query = [(country, self.country), (city, self.city), (street, self.street)]
+        query = [(wanted.lower(), actual.lower()) for wanted, actual in query if wanted is not None]
+        for i, (wanted, actual) in enumerate(query):
+            if prefix and i == len(query) - 1:
+                if not actual.startswith(wanted):
+                    return False
+            elif actual != wanted:
+                return False
+        return True
+
 
 class Email(Field):
     """
     Class to store email addresses. Validates the email using a regular expression.
     """
 
+    __slots__ = ()
+
     def __init__(self, value: str):
         """
         Initializes an Email object with a given value.
         :param value:
         """
         super().__init__(value)
-        self.email = self.validate_email()
+        self.validate_email()
+
+    @property
+    def email(self):
+        return self.value
 
     def validate_email(self):
         """
         Validates the email address using a regular expression.
-        :return: Raises "ValueError" if the email format is invalid.
+        :return: Raises "ValidationError" if the email format is invalid.
         """
-        email_pattern = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
-        if email_pattern.match(self.value):
-            return self.value
-        else:
-            # raise ValueError("Invalid email address.")
-            raise ValueError(f"{Color.RED}Invalid email address.{Color.RESET}")
+        return validate_email(self.value)
 
     def set_email(self, value: str):
         """
@@ -166,18 +227,41 @@ class Email(Field):
         :param value:
         :return: None
         """
+        old_value = self.value
         self.value = value
-        self.email = self.validate_email()
+        try:
+            self.validate_email()
+        except ValueError:
+            self.value = old_value
+            raise
 
     def __str__(self):
         return f"Email: {self.email}"
 
 
-class Record:
+def _missing(fields, new_fields) -> list:
+    """
+    Picks the fields whose value is not among the given ones, each value once.
+    :param fields: fields the contact already has.
+    :param new_fields:
+    :return list of fields to add:
+    """
+    known = {field.value for field in fields}
+    missing = []
+    for field in new_fields:
+        if field.value not in known:
+            known.add(field.value)
+            missing.append(field)
+    return missing
+
+
+class Record(Slotted):
     """
     Class to store contact information including name and phone numbers.
     """
 
+    __slots__ = ("name", "phones", "emails", "birthday", "addresses", "book")
+
     def __init__(self, name: str):
         """
         Initializes a Record object with a given name.
@@ -188,15 +272,48 @@ class Record:
         self.emails = []
         self.birthday = "Unknown"
         self.addresses = []
+        self.book = None
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        state.pop("book", None)
+        return state
+
+    def __setstate__(self, state):
+        self.addresses = []
+        super().__setstate__(state)
+        self.book = None
+
+    @contextmanager
+    def _updating(self):
+        """
+        Keeps the indexes of the owning address book in sync while the record is changed.
+        The change is recorded only if the block completes, a change that raised is not saved.
+        :return None:
+        """
+        book = self.book
+        if book is None:
+            yield
+            return
+        book._unindex_record(self)
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            book._index_record(self)
+            if completed:
+                book._mark_changed(self.name.value, self)
 
-    @data_validator
     def add_phone(self, phone: str):
         """
         Adds a phone number to the contact.
         :param phone:
         :return None:
         """
-        self.phones.append(Phone(phone))
+        new_phone = Phone(phone)
+        with self._updating():
+            self.phones.append(new_phone)
 
     def remove_phone(self, phone_number: str):
         """
@@ -204,11 +321,9 @@ class Record:
         :param phone_number:
         :return None:
         """
-        for p in self.phones:
-            if p.value == phone_number:
-                self.phones.remove(p)
+        with self._updating():
+            self.phones = [p for p in self.phones if p.value != phone_number]
 
-    @data_validator
     def edit_phone(self, old_phone_number: str, new_phone_number: str):
         """
         Edits a phone number in the phone list.
@@ -216,9 +331,11 @@ class Record:
         :param new_phone_number:
         :return None:
         """
-        for p in self.phones:
-            if p.value == old_phone_number:
-                p.value = str(Phone(str(new_phone_number)))
+        new_phone = Phone(str(new_phone_number))
+        with self._updating():
+            for p in self.phones:
+                if p.value == old_phone_number:
+                    p.value = new_phone.value
 
     def find_phone(self, phone_number: str):
         """
@@ -230,45 +347,63 @@ class Record:
             if p.value == phone_number:
                 return phone_number
 
-    @data_validator
     def add_birthday(self, birthday: str):
-        self.birthday = Birthday(birthday)
+        new_birthday = Birthday(birthday)
+        with self._updating():
+            self.birthday = new_birthday
 
-    @data_validator
     def add_address(self, country, city, street, house_number):
-        self.addresses.append(Address(country, city, street, house_number))
+        new_address = Address(country, city, street, house_number)
+        with self._updating():
+            self.addresses.append(new_address)
 
-    @data_validator
     def add_email(self, email: str):
         """
         Adds an email address to the contact.
         :param email:
         :return None:
         """
-        try:
-            new_email = Email(email)
+        new_email = Email(email)
+        with self._updating():
             self.emails.append(new_email)
-            print(f"{Color.GREEN}Email added.{Color.RESET}")
-        except ValueError as e:
-            print(f"{Color.RED}Error{Color.RESET}: {e}")
 
-    @data_validator
     def edit_email(self, old_email: str, new_email: str):
         """
         Edits an email address in the email list.
         :param old_email:
         :param new_email:
-        :return None:
+        :return True if the old email was found and replaced:
         """
         for e in self.emails:
             if e.value == old_email:
-                e.set_email(new_email)
-                # print("Email updated.")
-                print(f"{Color.GREEN}Email updated.{Color.RESET}")
-                break
-        else:
-            # print("Old email not found.")
-            print(f"{Color.RED}Old email not found.{Color.RESET}")
+                with self._updating():
+                    e.set_email(new_email)
+                return True
+        return False
+
+    def merge(self, phones=(), emails=(), birthday=None, addresses=()) -> bool:
+        """
+        Adds the phones, emails and addresses the contact doesn't have yet,
+        and the birthday if the contact has none. Values are compared by their text.
+        :param phones: Phone objects.
+        :param emails: Email objects.
+        :param birthday: Birthday object or None.
+        :param addresses: Address objects.
+        :return True if anything was added:
+        """
+        new_phones = _missing(self.phones, phones)
+        new_emails = _missing(self.emails, emails)
+        new_addresses = _missing(self.addresses, addresses)
+        set_birthday = birthday is not None and self.birthday == "Unknown"
+        if not (new_phones or new_emails or new_addresses or set_birthday):
+            return False
+        with self._updating():
+            self.phones.extend(new_phones)
+            self.emails.extend(new_emails)
+            self.addresses.extend(new_addresses)
+            if set_birthday:
+                self.birthday = birthday
+        return True
 
     def __str__(self):
         phone_info = "; ".join([p.value for p in self.phones])
@@ -284,15 +419,158 @@ class Record:
 class AddressBook(UserDict):
     """
     Class to manage and store records in an address book.
+    Keeps lookup indexes in sync with the records it holds
+    and remembers which records changed since the last commit.
     """
 
+    def __init__(self, *args, **kwargs):
+        self._changes = {}
+        self.generation = 0
+        self._phones = RecordIndex()
+        self._emails = RecordIndex()
+        self._addresses = AddressIndex()
+        self._birthdays = BirthdayIndex()
+        # Built by the first fuzzy search or completion, most runs never need them.
+        self._names = None
+        self._name_trie = None
+        super().__init__(*args, **kwargs)
+
+    def __setitem__(self, name: str, record: Record):
+        old_record = self.data.get(name)
+        if old_record is not None:
+            self._unindex_record(old_record)
+            old_record.book = None
+        self.data[name] = record
+        record.book = self
+        self._index_record(record)
+        self._mark_changed(name, record)
+
+    def __delitem__(self, name: str):
+        record = self.data.pop(name)
+        self._unindex_record(record)
+        record.book = None
+        self._mark_changed(name, None)
+
+    def __getstate__(self):
+        return {"data": self.data}
+
+    def __setstate__(self, state):
+        self.__init__()
+        for name, record in state["data"].items():
+            self[name] = record
+        self._changes = {}
+
+    def _mark_changed(self, name: str, record):
+        """
+        Remembers that the record changed and moves the book to a new generation.
+        :param name:
+        :param record: Record, or None if it was deleted.
+        :return None:
+        """
+        self._changes[name] = record
+        self.generation += 1
+        if self._names is not None:
+            if record is None:
+                self._names.discard(name)
+            else:
+                self._names.add(name)
+        if self._name_trie is not None:
+            if record is None:
+                self._name_trie.discard(name)
+            elif name not in self._name_trie:
+                self._name_trie.add(name)
+
+    @property
+    def dirty(self):
+        """
+        Tells whether the book has changes that were not committed yet.
+        :return bool:
+        """
+        return bool(self._changes)
+
+    def pop_changes(self):
+        """
+        Returns the records changed since the last call and forgets them.
+        :return dict name -> Record, or None for deleted records:
+        """
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def restore_changes(self, changes: dict):
+        """
+        Puts back changes taken by pop_changes that could not be written.
+        Changes made since then are newer and win over them.
+        :param changes: dict name -> Record, or None for deleted records.
+        :return None:
+        """
+        restored = dict(changes)
+        restored.update(self._changes)
+        self._changes = restored
+
+    def flush(self):
+        """
+        Writes pending changes to the backing store. Records kept in memory have nothing to flush.
+        :return None:
+        """
+
+    def save_snapshot(self, path: str):
+        """
+        Replaces the snapshot file with the whole address book.
+        :param path:
+        :return None:
+        """
+        from yada import snapshot
+        snapshot.write(self, path)
+
+    def snapshot_writer(self, path: str):
+        """
+        Encodes the whole address book as a snapshot, so the file can be written later without the book.
+        :param path:
+        :return function replacing the snapshot file:
+        """
+        from yada import snapshot
+        data = snapshot.dumps(self)
+        return lambda: snapshot.write_bytes(data, path)
+
+    def _index_record(self, record: Record):
+        """
+        Adds the record fields to the lookup indexes.
+        :param record:
+        :return None:
+        """
+        for phone in record.phones:
+            self._phones.add(normalize_phone(phone.value), record)
+        for email in record.emails:
+            self._emails.add(email.value.lower(), record)
+        for address in record.addresses:
+            self._addresses.add(address, record)
+        birthday = getattr(record.birthday, "birthday", None)
+        if birthday is not None:
+            self._birthdays.add(birthday, record)
+
+    def _unindex_record(self, record: Record):
+        """
+        Removes the record fields from the lookup indexes.
+        :param record:
+        :return None:
+        """
+        for phone in record.phones:
+            self._phones.discard(normalize_phone(phone.value), record)
+        for email in record.emails:
+            self._emails.discard(email.value.lower(), record)
+        for address in record.addresses:
+            self._addresses.discard(address, record)
+        birthday = getattr(record.birthday, "birthday", None)
+        if birthday is not None:
+            self._birthdays.discard(birthday, record)
+
     def add_record(self, user: Record):
         """
         Adds a record to the address book.
         :param user:
         :return None:
         """
-        self.data[user.name.value] = user
+        self[user.name.value] = user
 
     def find(self, name: str):
         """
@@ -300,19 +578,51 @@ class AddressBook(UserDict):
         :param name:
         :return returns the string representation of the contact information:
         """
+        profiler.count("index", "names")
         return f"{self.data.get(name.lower())}\n"
 
+    def _all_names(self):
+        """
+        :return iterable over the names of all records, for building the name indexes:
+        """
+        return self.data.keys()
+
+    def find_fuzzy(self, name: str, k: int = 5, max_distance: int = FUZZY_MAX_DISTANCE):
+        """
+        Finds the records whose names are closest to the given one, tolerating typos.
+        :param name:
+        :param k: number of records to return at most.
+        :param max_distance: largest number of typos allowed.
+        :return list of (distance, record) pairs, closest first:
+        """
+        if self._names is None:
+            self._names = NameIndex()
+            for known in self._all_names():
+                self._names.add(known)
+        return [(distance, self.data[found])
+                for distance, found in self._names.closest(name.lower(), k, max_distance)]
+
+    def complete_names(self, prefix: str, limit: int):
+        """
+        Finds names starting with the prefix.
+        :param prefix:
+        :param limit: largest number of names to return.
+        :return list of names in alphabetical order:
+        """
+        if self._name_trie is None:
+            self._name_trie = PrefixTrie()
+            for known in self._all_names():
+                self._name_trie.add(known)
+        return self._name_trie.complete(prefix.lower(), limit)
+
     def find_by_phone(self, phone: str):
         """
         Finds a record in the address book by phone number.
         :param phone:
         :return returns the contact information:
         """
-        for record in self.data.values():
-            for record_phone in record.phones:
-                if record_phone.value == phone:
-                    return record
-        return None
+        profiler.count("index", "phones")
+        return self._phones.first(normalize_phone(phone))
 
     def find_by_birthday(self, birthday: str):
         """
@@ -320,13 +630,22 @@ class AddressBook(UserDict):
         :param birthday: A string representing the birthday in the format "DD.MM.YYYY".
         :return returns a list of contact information:
         """
-        matching_records = []
-
-        for record in self.data.values():
-            if str(record.birthday) == birthday:
-                matching_records.append(record)
+        try:
+            day = datetime.strptime(birthday, "%d.%m.%Y").date()
+        except ValueError:
+            return []
+        profiler.count("index", "birthdays")
+        return [record for record in self._birthdays.on_day(day) if str(record.birthday) == birthday]
 
-        return matching_records
+    def upcoming_birthdays(self, days: int, today: date = None):
+        """
+        Finds the next birthdays within the given number of days.
+        :param days: Length of the period, today included.
+        :param today: First day of the period, the current date by default.
+        :return list of (celebration date, record) pairs ordered by date:
+        """
+        profiler.count("index", "birthdays")
+        return self._birthdays.upcoming(today or date.today(), days)
 
     def find_by_email(self, email):
         """
@@ -334,25 +653,39 @@ class AddressBook(UserDict):
         :param email: A string representing the email.
         :return returns a list of contact information:
         """
-        matching_records = []
-        for record in self.data.values():
-            for record_email in record.emails:
-                if str(record_email.value.lower()) == email.lower():
-                    matching_records.append(record)
-        return matching_records
+        profiler.count("index", "emails")
+        return self._emails.get(email.lower())
 
-    def find_by_address(self, address):
+    def find_by_address(self, city=None, street=None, country=None, prefix=False):
         """
         Finds records in the address book by address.
-        :param address: A string representing the address.
+        Any combination of parts can be given, e.g. only a country or a city and a street.
+        :param city: A string representing the city.
+        :param street: A string representing the street.
+        :param country: A string representing the country.
+        :param prefix: Match the most specific given part as a prefix.
         :return returns a list of contact information:
         """
-        matching_records = []
-        for record in self.data.values():
-            for record_address in record.addresses:
-                if record_address.city.lower() == address.lower():
-                    matching_records.append(record)
-        return matching_records
+        profiler.count("index", "addresses")
+        return self._addresses.find(country, city, street, prefix)
+
+    def count_by_address(self, city=None, street=None, country=None, prefix=False):
+        """
+        Counts records in the address book by address.
+        :param city:
+        :param street:
+        :param country:
+        :param prefix:
+        :return number of matching contacts:
+        """
+        return self._addresses.count(country, city, street, prefix)
+
+    def count_by_city(self):
+        """
+        Returns the number of contacts living in every known city.
+        :return dict city -> count:
+        """
+        return self._addresses.city_counts()
 
     def delete(self, name: str):
         """
@@ -361,4 +694,4 @@ class AddressBook(UserDict):
         :return None:
         """
         if name.lower() in self.data:
-            del self.data[name.lower()]
+            del self[name.lower()]
@@ -0,0 +1,67 @@
+import threading
+import time
+
+# Seconds without new changes before they are written.
+AUTOSAVE_DELAY = 1.0
+# Longest wait for the last write when the assistant exits.
+FLUSH_TIMEOUT = 5.0
+
+
+class Autosave:
+    """
+    Commits the changes of a session on a background thread, so the prompt comes back
+    as soon as a command is done instead of after its files are rewritten.
+    A burst of commands is coalesced into one commit once no command changed anything for `delay` seconds.
+    The changes are taken under session.lock, between commands, and the files are written after it is released.
+    The autosave thread is the only one committing while it runs, so its writes never interleave.
+    """
+
+    def __init__(self, session, delay: float = AUTOSAVE_DELAY):
+        self.session = session
+        self.delay = delay
+        self.error = None
+        self._due = None
+        self._closing = False
+        self._wakeup = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="yada-autosave", daemon=True)
+        self._thread.start()
+
+    def schedule(self):
+        """
+        Asks for a commit `delay` seconds from now, postponing one that is already waiting.
+        :return None:
+        """
+        with self._wakeup:
+            self._due = time.monotonic() + self.delay
+            self._wakeup.notify()
+
+    def close(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """
+        Writes the pending changes right away and stops the thread.
+        :param timeout: seconds to wait for the write.
+        :return True if everything was written, False if the write is still running or failed:
+        """
+        with self._wakeup:
+            self._closing = True
+            self._wakeup.notify()
+        self._thread.join(timeout)
+        return not self._thread.is_alive() and self.error is None
+
+    def _run(self):
+        while True:
+            with self._wakeup:
+                while not self._closing and (self._due is None or time.monotonic() < self._due):
+                    self._wakeup.wait(None if self._due is None else self._due - time.monotonic())
+                closing = self._closing
+                self._due = None
+            try:
+                with self.session.lock:
+                    pending = self.session.prepare_commit()
+                self.session.write_pending(pending)
+            except Exception as error:
+                # Reported by close(), a later commit may still succeed.
+                self.error = error
+            else:
+                self.error = None
+            if closing:
+                return
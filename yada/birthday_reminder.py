@@ -1,8 +1,10 @@
 from collections import defaultdict
 from datetime import datetime
-from tabulate import tabulate
 
 from yada.address_book import AddressBook, Color
+from yada.render import render_table
+
+WEEK_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
 
 
 def get_birthdays_per_week(args: list, contacts: AddressBook):
@@ -22,28 +24,16 @@ def get_birthdays_per_week(args: list, contacts: AddressBook):
             f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
             f" {Color.YELLOW}<birthday> <*sought_interval>{Color.RESET}\n")
         return None
-    for u_name, record in contacts.data.items():
-        name = u_name
-        try:
-            birthday = record.birthday.birthday
-        except AttributeError:
-            continue
-        birthday_this_year = birthday.replace(year=today_date.year)
-        if birthday_this_year < today_date:
-            birthday_this_year = birthday.replace(year=today_date.year + 1)
-        delta_days = (birthday_this_year - today_date).days
-        if delta_days < sought_interval:
-            if birthday_this_year.weekday() in [5, 6]:
-                birthdays_this_week["Monday"].append(birthday_this_year.strftime('%d/%m'))
-                birthdays_this_week["Monday"].append(name.title())
-            else:
-                birthdays_this_week[birthday_this_year.strftime("%A")].append(birthday_this_year.strftime("%d/%m"))
-                birthdays_this_week[birthday_this_year.strftime("%A")].append(name.title())
+    for birthday_this_year, record in contacts.upcoming_birthdays(sought_interval, today_date):
+        weekday = birthday_this_year.weekday()
+        day_name = "Monday" if weekday in (5, 6) else WEEK_DAYS[weekday]
+        birthdays_this_week[day_name].append((f"{birthday_this_year.day:02}/{birthday_this_year.month:02}",
+                                              record.name.value.title()))
     if birthdays_this_week:
         headers = [f"{Color.CYAN}Week Day{Color.RESET}", f"{Color.CYAN}Date{Color.RESET}",
                    f"{Color.CYAN}Name{Color.RESET}"]
-        data = [[name, birthday[0], birthday[1]] for name, birthday in birthdays_this_week.items()]
-        table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-        print(table)
+        data = [[day_name, "\n".join(day for day, _ in birthdays), "\n".join(name for _, name in birthdays)]
+                for day_name, birthdays in birthdays_this_week.items()]
+        print(render_table(headers, data))
     else:
         print(f"{Color.GREEN}It seems like no one has a birthday this week{Color.RESET}\n")
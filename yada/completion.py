@@ -0,0 +1,57 @@
+from prompt_toolkit.completion import Completer, Completion
+
+# Largest number of completions offered at once.
+COMPLETION_LIMIT = 20
+# Commands whose first argument is a contact name.
+NAME_COMMANDS = ("add", "remove", "change", "find-name", "find-fuzzy", "add-birthday", "show-birthday",
+                 "add-address", "add-email", "edit-email")
+# Commands taking tags, with the position of the first one among the arguments.
+TAG_COMMANDS = {"add-tag": 1, "delete-tag": 1, "search-notes-by-tag": 0}
+
+
+class AssistantCompleter(Completer):
+    """
+    Completes command names, then contact names or note tags depending on the command.
+    Names and tags come from the prefix tries of the address book and the notebook,
+    so a keypress costs the same in a book of ten contacts and of a million.
+    Completion runs on the prompt thread: it looks names and tags up under session.lock,
+    and offers none while autosave holds the lock or before a command loaded the data.
+    """
+
+    def __init__(self, session, commands, limit: int = COMPLETION_LIMIT):
+        self.session = session
+        self.commands = sorted(commands)
+        self.limit = limit
+
+    def get_completions(self, document, complete_event):
+        words = document.text_before_cursor.split()
+        if document.text_before_cursor[-1:].isspace():
+            words.append("")
+        if len(words) <= 1:
+            prefix = words[0].lower() if words else ""
+            matches = [command for command in self.commands if command.startswith(prefix)]
+        else:
+            prefix = words[-1].lower()
+            matches = self._argument_matches(words[0].lower(), len(words) - 2, prefix)
+        for match in matches[:self.limit]:
+            yield Completion(match, start_position=-len(prefix))
+
+    def _argument_matches(self, command: str, position: int, prefix: str) -> list:
+        if command in NAME_COMMANDS and position == 0:
+            names = True
+        elif command in TAG_COMMANDS and position >= TAG_COMMANDS[command] and prefix != "--any":
+            names = False
+        else:
+            return []
+        session = self.session
+        if not (session.contacts_loaded if names else session.notebook_loaded):
+            return []
+        # A keypress never waits for a commit running on the autosave thread.
+        if not session.lock.acquire(blocking=False):
+            return []
+        try:
+            if names:
+                return session.contacts.complete_names(prefix, self.limit)
+            return session.notebook.complete_tags(prefix, self.limit)
+        finally:
+            session.lock.release()
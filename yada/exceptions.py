@@ -1,4 +1,5 @@
 from yada.address_book import AddressBook, Color
+from yada.validation import ValidationError
 
 
 class PhoneLengthError(Exception):
@@ -65,6 +66,10 @@ class FindNameIndexError(Exception):
     pass
 
 
+class FindFuzzyValueError(Exception):
+    pass
+
+
 class FindEmailIndexError(Exception):
     pass
 
@@ -77,6 +82,40 @@ class FindBirthdayIndexError(Exception):
     pass
 
 
+class ImportIndexError(Exception):
+    pass
+
+
+class ImportFileError(Exception):
+    """
+    Raised when an import file can't be decoded or parsed. Contacts read before the error stay imported.
+    """
+
+    def __init__(self, path, line, message, imported=0, merged=0):
+        super().__init__(f"Import of {path} stopped at line {line}: {message}. "
+                         f"{imported} contacts were imported and {merged} merged into existing ones before it.")
+        self.path = path
+        self.line = line
+        self.imported = imported
+        self.merged = merged
+
+
+class ExportIndexError(Exception):
+    pass
+
+
+class ExportNotesError(Exception):
+    pass
+
+
+class ShowAllValueError(Exception):
+    pass
+
+
+class ShowAllNotesError(Exception):
+    pass
+
+
 class AddNoteError(Exception):
     pass
 
@@ -136,7 +175,7 @@ def input_note_error(func):
         except SearchNoteByTagError:
             print(
                 f"{Color.RED}Enter a valid command in format {Color.RESET}--->>>"
-                f" {Color.YELLOW}search-notes-by-tag <tag>\n{Color.RESET}")
+                f" {Color.YELLOW}search-notes-by-tag <tag> <*tag ...> <*--any>\n{Color.RESET}")
         except AddTagError:
             print(
                 f"{Color.RED}Enter a valid command in format {Color.RESET}--->>>"
@@ -145,6 +184,16 @@ def input_note_error(func):
             print(
                 f"{Color.RED}Enter a valid command in format {Color.RESET}--->>>"
                 f" {Color.YELLOW}delete-tag <note id> <tag>\n{Color.RESET}")
+        except ShowAllNotesError:
+            print(
+                f"{Color.RED}Enter a valid command in format {Color.RESET}--->>>"
+                f" {Color.YELLOW}all-notes <*--page N> <*--limit N> <*--sort id|text|tags> <*--reverse>\n{Color.RESET}")
+        except ExportNotesError:
+            print(
+                f"{Color.RED}Enter a valid command in format {Color.RESET}--->>>"
+                f" {Color.YELLOW}export-notes <path or -> <*csv|jsonl>\n{Color.RESET}")
+        except OSError as error:
+            print(f"{Color.RED}Can't write {error.filename}: {error.strerror}.\n{Color.RESET}")
 
     return inner
 
@@ -189,6 +238,8 @@ def input_error(func):
             print(
                 f"{Color.RED}Enter a valid command in this format{Color.RESET} --->>>"
                 f" {Color.YELLOW}<adit-email> <name> <old_email> <new_email>\n{Color.RESET}")
+        except ValidationError as error:
+            print(f"{Color.RED}{error}\n{Color.RESET}")
         except KeyError:
             print(f"{Color.RED}This contact was not found in the system. Try again.\n{Color.RESET}")
         except ShowBirthdayIndexError:
@@ -203,6 +254,10 @@ def input_error(func):
             print(
                 f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
                 f" {Color.YELLOW}<find-name> <phone>\n{Color.RESET}")
+        except FindFuzzyValueError:
+            print(
+                f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
+                f" {Color.YELLOW}<find-fuzzy> <name> <*number of contacts>\n{Color.RESET}")
         except FindEmailIndexError:
             print(
                 f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
@@ -210,11 +265,31 @@ def input_error(func):
         except FindAddressIndexError:
             print(
                 f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
-                f" {Color.YELLOW}<find-address> <city>\n{Color.RESET}")
+                f" {Color.YELLOW}<find-address> <city> <*street> <*--country country>{Color.RESET}"
+                f" or {Color.YELLOW}<find-address> --country <country>{Color.RESET},"
+                f" '*' only at the end of the last part\n")
         except FindBirthdayIndexError:
             print(
                 f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
                 f" {Color.YELLOW}<find-birthday> <DD.MM.YYYY.>\n{Color.RESET}")
+        except ImportIndexError:
+            print(
+                f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
+                f" {Color.YELLOW}<import> <path> <*csv|vcard>\n{Color.RESET}")
+        except ImportFileError as error:
+            print(f"{Color.RED}{error}\n{Color.RESET}")
+        except ShowAllValueError:
+            print(
+                f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
+                f" {Color.YELLOW}<all> <*--page N> <*--limit N> <*--sort name|birthday> <*--reverse>\n{Color.RESET}")
+        except ExportIndexError:
+            print(
+                f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
+                f" {Color.YELLOW}<export> <path or -> <*csv|jsonl|vcard>\n{Color.RESET}")
+        except FileNotFoundError as error:
+            print(f"{Color.RED}File {error.filename} was not found.\n{Color.RESET}")
+        except OSError as error:
+            print(f"{Color.RED}Can't access {error.filename}: {error.strerror}.\n{Color.RESET}")
         except PhoneLengthError:
             print(f"{Color.RED}Phone number must be 10 digits long\n{Color.RESET}")
         except BirthdayFormatError:
@@ -0,0 +1,189 @@
+import csv
+import json
+import sys
+from contextlib import contextmanager
+
+from yada.address_book import AddressBook, Birthday
+from yada.importer import CSV_COLUMNS, LIST_SEPARATOR
+from yada.notebook import Notebook
+
+CONTACT_EXPORT_FORMATS = ("csv", "jsonl", "vcard")
+NOTE_EXPORT_FORMATS = ("csv", "jsonl")
+# Path meaning the standard output.
+STDOUT_PATH = "-"
+NOTE_CSV_COLUMNS = ("id", "text", "tags")
+
+_EXTENSION_FORMATS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".vcf": "vcard", ".vcard": "vcard"}
+
+
+def detect_export_format(path: str, default="csv") -> str:
+    """
+    Guesses the export format from the file extension.
+    :param path:
+    :param default: format used for the standard output and unknown extensions.
+    :return format name:
+    """
+    for extension, file_format in _EXTENSION_FORMATS.items():
+        if path.lower().endswith(extension):
+            return file_format
+    return default
+
+
+def _birthday(record):
+    return record.birthday.value if isinstance(record.birthday, Birthday) else None
+
+
+def contact_csv_rows(records):
+    """
+    Turns contacts into rows of CSV_COLUMNS, the format read by the importer.
+    A contact with several addresses continues on extra rows holding only its name and the address.
+    :param records:
+    :return generator of lists:
+    """
+    yield list(CSV_COLUMNS)
+    for record in records:
+        addresses = record.addresses or [None]
+        for i, address in enumerate(addresses):
+            if i == 0:
+                row = [record.name.value,
+                       LIST_SEPARATOR.join(phone.value for phone in record.phones),
+                       LIST_SEPARATOR.join(email.value for email in record.emails),
+                       _birthday(record) or ""]
+            else:
+                row = [record.name.value, "", "", ""]
+            if address is None:
+                row += ["", "", "", ""]
+            else:
+                row += [address.country, address.city, address.street, address.house_number]
+            yield row
+
+
+def contact_json_lines(records):
+    """
+    Turns every contact into one JSON object per line.
+    :param records:
+    :return generator of str:
+    """
+    for record in records:
+        yield json.dumps({
+            "name": record.name.value,
+            "phones": [phone.value for phone in record.phones],
+            "emails": [email.value for email in record.emails],
+            "birthday": _birthday(record),
+            "addresses": [{"country": address.country, "city": address.city, "street": address.street,
+                           "house_number": address.house_number} for address in record.addresses],
+        }, ensure_ascii=False) + "\n"
+
+
+def _vcard_escape(value: str) -> str:
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\n", "\\n"))
+
+
+def contact_vcard_lines(records):
+    """
+    Turns every contact into a vCard 3.0 card.
+    :param records:
+    :return generator of str:
+    """
+    for record in records:
+        name = _vcard_escape(record.name.value)
+        yield f"BEGIN:VCARD\r\nVERSION:3.0\r\nFN:{name}\r\nN:{name};;;;\r\n"
+        for phone in record.phones:
+            yield f"TEL:{phone.value}\r\n"
+        for email in record.emails:
+            yield f"EMAIL:{email.value}\r\n"
+        birthday = getattr(record.birthday, "birthday", None)
+        if birthday is not None:
+            yield f"BDAY:{birthday.isoformat()}\r\n"
+        for address in record.addresses:
+            street = " ".join(part for part in (address.street, address.house_number) if part)
+            yield (f"ADR:;;{_vcard_escape(street)};{_vcard_escape(address.city)};;;"
+                   f"{_vcard_escape(address.country)}\r\n")
+        yield "END:VCARD\r\n"
+
+
+def note_csv_rows(notes):
+    """
+    Turns notes into rows of NOTE_CSV_COLUMNS, tags separated by LIST_SEPARATOR.
+    :param notes:
+    :return generator of lists:
+    """
+    yield list(NOTE_CSV_COLUMNS)
+    for note in notes:
+        yield [note.id, note.text, LIST_SEPARATOR.join(note.tags)]
+
+
+def note_json_lines(notes):
+    """
+    Turns every note into one JSON object per line.
+    :param notes:
+    :return generator of str:
+    """
+    for note in notes:
+        yield json.dumps({"id": note.id, "text": note.text, "tags": list(note.tags)}, ensure_ascii=False) + "\n"
+
+
+@contextmanager
+def open_output(path: str):
+    """
+    Opens the export file for writing, or gives the standard output for STDOUT_PATH.
+    :param path:
+    :return file object:
+    """
+    if path == STDOUT_PATH:
+        yield sys.stdout
+        sys.stdout.flush()
+        return
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        yield file
+
+
+def _write(path, file_format, items, csv_rows, text_lines):
+    """
+    Writes the items one by one, so memory does not grow with their number.
+    The format is checked before the file is created.
+    :return number of items written:
+    """
+    if file_format != "csv" and file_format not in text_lines:
+        raise ValueError(f"Can't export in the {file_format} format")
+    count = 0
+
+    def counted():
+        nonlocal count
+        for item in items:
+            count += 1
+            yield item
+
+    with open_output(path) as file:
+        if file_format == "csv":
+            csv.writer(file).writerows(csv_rows(counted()))
+        else:
+            file.writelines(text_lines[file_format](counted()))
+    return count
+
+
+def export_contacts(contacts: AddressBook, path: str, file_format=None) -> int:
+    """
+    Streams all contacts to a file or to the standard output.
+    :param contacts:
+    :param path: file name, or "-" for the standard output.
+    :param file_format: "csv", "jsonl" or "vcard", guessed from the file extension by default.
+    :return number of exported contacts:
+    """
+    file_format = file_format or detect_export_format(path)
+    return _write(path, file_format, contacts.values(), contact_csv_rows,
+                  {"jsonl": contact_json_lines, "vcard": contact_vcard_lines})
+
+
+def export_notes(notebook: Notebook, path: str, file_format=None) -> int:
+    """
+    Streams all notes to a file or to the standard output.
+    :param notebook:
+    :param path: file name, or "-" for the standard output.
+    :param file_format: "csv" or "jsonl", guessed from the file extension by default.
+    Raises ValueError for other formats, such as "vcard" guessed from a .vcf file.
+    :return number of exported notes:
+    """
+    file_format = file_format or detect_export_format(path)
+    return _write(path, file_format, notebook.notes.values(), note_csv_rows, {"jsonl": note_json_lines})
@@ -0,0 +1,302 @@
+import csv
+import re
+from itertools import islice
+from operator import itemgetter
+
+from yada.address_book import Address, AddressBook, Birthday, Email, Phone, Record
+from yada.exceptions import ImportFileError
+from yada.validation import validate_many
+
+IMPORT_FORMATS = ("csv", "vcard")
+# Rows are validated and added to the address book this many at a time.
+CHUNK_SIZE = 10000
+# Columns of the CSV file. Several phones or emails in one cell are separated by LIST_SEPARATOR.
+CSV_COLUMNS = ("name", "phones", "emails", "birthday", "country", "city", "street", "house_number")
+LIST_SEPARATOR = ";"
+# Only the first errors are kept for the report, the rest are just counted.
+MAX_REPORTED_ERRORS = 20
+
+_COLUMN_ALIASES = {"phone": "phones", "email": "emails"}
+_VCARD_COMPONENT_SEPARATOR = re.compile(r"(?<!\\);")
+_VCARD_DATE_PATTERN = re.compile(r"^(\d{4})-?(\d{2})-?(\d{2})$")
+_VCARD_ESCAPES = re.compile(r"\\(.)")
+
+
+class ImportRow:
+    """
+    One contact read from an import file, before validation.
+    """
+
+    __slots__ = ("line", "name", "phones", "emails", "birthday", "addresses")
+
+    def __init__(self, line, name, phones, emails, birthday=None, addresses=None):
+        self.line = line
+        self.name = name
+        self.phones = phones
+        self.emails = emails
+        self.birthday = birthday
+        self.addresses = addresses if addresses else []
+
+
+class ImportReport:
+    """
+    Outcome of an import: how many contacts were added, how many rows were merged into existing contacts
+    or had nothing new for them, and what was rejected.
+    """
+
+    def __init__(self):
+        self.imported = 0
+        self.merged = 0
+        self.unchanged = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f"line {line}: {message}")
+
+
+class _LineCounter:
+    """
+    Passes the lines of a file through and counts them, so a parse error can name its line.
+    """
+
+    def __init__(self, file):
+        self._file = file
+        self.line = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = next(self._file)
+        self.line += 1
+        return line
+
+
+def _undecodable_line(path: str) -> int:
+    """
+    Finds the first line that is not valid UTF-8. Text files decode ahead of the line being read,
+    so the line is looked up again only after decoding failed.
+    :param path:
+    :return line number, or 0 if every line decodes:
+    """
+    with open(path, "rb") as file:
+        for number, line in enumerate(file, 1):
+            try:
+                line.decode("utf-8")
+            except UnicodeDecodeError:
+                return number
+    return 0
+
+
+def detect_format(path: str) -> str:
+    """
+    Guesses the import format from the file extension.
+    :param path:
+    :return "vcard" for .vcf and .vcard files, "csv" otherwise:
+    """
+    return "vcard" if path.lower().endswith((".vcf", ".vcard")) else "csv"
+
+
+def _split_list(cell):
+    return [item.strip() for item in (cell or "").split(LIST_SEPARATOR) if item.strip()]
+
+
+def read_csv_rows(file):
+    """
+    Streams contacts from a CSV file with a header row naming the CSV_COLUMNS.
+    :param file: file opened in text mode, or another iterable of its lines.
+    :return generator of ImportRow:
+    """
+    reader = csv.reader(file)
+    header = next(reader, None)
+    if header is None:
+        return
+    columns = [_COLUMN_ALIASES.get(column.strip().lower(), column.strip().lower()) for column in header]
+    for row in reader:
+        if not any(row):
+            continue
+        values = dict(zip(columns, row))
+        addresses = []
+        if values.get("city") or values.get("street"):
+            addresses.append(tuple(values.get(column, "").strip()
+                                   for column in ("country", "city", "street", "house_number")))
+        yield ImportRow(reader.line_num, (values.get("name") or "").strip(),
+                        _split_list(values.get("phones")), _split_list(values.get("emails")),
+                        (values.get("birthday") or "").strip() or None, addresses)
+
+
+def _unescape(value):
+    return _VCARD_ESCAPES.sub(lambda match: "\n" if match.group(1) in "nN" else match.group(1), value)
+
+
+def _vcard_lines(file):
+    """
+    Joins folded vCard lines: a line starting with a space or a tab continues the previous one.
+    :param file:
+    :return generator of (line number, unfolded line):
+    """
+    current = None
+    start = 0
+    for number, line in enumerate(file, 1):
+        line = line.rstrip("\r\n")
+        if line[:1] in (" ", "\t") and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield start, current
+        current, start = line, number
+    if current is not None:
+        yield start, current
+
+
+def _vcard_address(value):
+    parts = [_unescape(part).strip() for part in _VCARD_COMPONENT_SEPARATOR.split(value)]
+    parts += [""] * (7 - len(parts))
+    street, city, country = parts[2], parts[3], parts[6]
+    house_number = ""
+    street_name, _, last_word = street.rpartition(" ")
+    if street_name and last_word[:1].isdigit():
+        street, house_number = street_name, last_word
+    return country, city, street, house_number
+
+
+def _vcard_birthday(value):
+    match = _VCARD_DATE_PATTERN.match(value)
+    if match is None:
+        return value
+    year, month, day = match.groups()
+    return f"{day}.{month}.{year}"
+
+
+def read_vcard_rows(file):
+    """
+    Streams contacts from a vCard file. FN, TEL, EMAIL, BDAY and ADR properties are read.
+    :param file: file opened in text mode, or another iterable of its lines.
+    :return generator of ImportRow:
+    """
+    row = None
+    for number, line in _vcard_lines(file):
+        name, _, value = line.partition(":")
+        name = name.split(";", 1)[0].split(".")[-1].upper()
+        if name == "BEGIN" and value.upper() == "VCARD":
+            row = ImportRow(number, "", [], [])
+        elif row is None:
+            continue
+        elif name == "END":
+            yield row
+            row = None
+        elif name == "FN":
+            row.name = _unescape(value).strip()
+        elif name == "TEL":
+            phone = value.strip().replace(" ", "").replace("-", "")
+            row.phones.append(phone[4:] if phone.lower().startswith("tel:") else phone)
+        elif name == "EMAIL":
+            row.emails.append(value.strip())
+        elif name == "BDAY":
+            row.birthday = _vcard_birthday(value.strip())
+        elif name == "ADR":
+            row.addresses.append(_vcard_address(value))
+
+
+def _validate_column(field, rows, values_of, errors):
+    """
+    Validates one column of a chunk in a single call.
+    :param errors: list the (line, message) pairs of invalid values are added to.
+    :return list with the valid values of every row:
+    """
+    owners = []
+    values = []
+    for position, row in enumerate(rows):
+        for value in values_of(row):
+            owners.append(position)
+            values.append(value)
+    results, rejected = validate_many(field, values)
+    for error in rejected:
+        errors.append((rows[owners[error.index]].line, f"{error} ({error.value!r})"))
+    valid = [[] for _ in rows]
+    for position, value, result in zip(owners, values, results):
+        if result is not None:
+            valid[position].append((value, result))
+    return valid
+
+
+def _import_chunk(rows, contacts: AddressBook, report: ImportReport):
+    """
+    Validates a chunk of rows column by column and adds the contacts to the address book.
+    Invalid values are reported in line order and left out, rows without a name are skipped.
+    """
+    errors = []
+    named_rows = []
+    for row in rows:
+        if row.name:
+            named_rows.append(row)
+        else:
+            errors.append((row.line, "Contact name is missing."))
+    phones = _validate_column("phone", named_rows, lambda row: row.phones, errors)
+    emails = _validate_column("email", named_rows, lambda row: row.emails, errors)
+    birthdays = _validate_column("birthday", named_rows,
+                                 lambda row: [row.birthday] if row.birthday else [], errors)
+    # Chunks follow the file, so sorting each of them keeps the whole report in line order.
+    for line, message in sorted(errors, key=itemgetter(0)):
+        report.add_error(line, message)
+    for row, row_phones, row_emails, row_birthday in zip(named_rows, phones, emails, birthdays):
+        new_phones = [Phone.from_valid(value) for value, _ in row_phones]
+        new_emails = [Email.from_valid(value) for value, _ in row_emails]
+        birthday = None
+        if row_birthday:
+            value, day = row_birthday[0]
+            birthday = Birthday.from_valid(value, birthday=day)
+        addresses = [Address(*address) for address in row.addresses]
+        name = row.name.lower()
+        if name in contacts:
+            if contacts[name].merge(new_phones, new_emails, birthday, addresses):
+                report.merged += 1
+            else:
+                report.unchanged += 1
+        else:
+            record = Record(name)
+            record.phones = new_phones
+            record.emails = new_emails
+            if birthday is not None:
+                record.birthday = birthday
+            record.addresses = addresses
+            contacts.add_record(record)
+            report.imported += 1
+    contacts.flush()
+
+
+def import_contacts(path: str, contacts: AddressBook, file_format=None, chunk_size=CHUNK_SIZE) -> ImportReport:
+    """
+    Streams contacts from a CSV or vCard file into the address book, CHUNK_SIZE rows at a time.
+    Contacts that already exist get the new phones, emails and addresses added to them.
+    Nothing is saved here, the caller commits the address book once at the end.
+    A file that is not UTF-8 or is not valid CSV raises ImportFileError with the line of the problem,
+    keeping the contacts of the chunks imported before it.
+    :param path:
+    :param contacts:
+    :param file_format: "csv" or "vcard", guessed from the file extension by default.
+    :param chunk_size:
+    :return ImportReport:
+    """
+    file_format = file_format or detect_format(path)
+    read_rows = read_vcard_rows if file_format == "vcard" else read_csv_rows
+    report = ImportReport()
+    with open(path, encoding="utf-8", newline="") as file:
+        lines = _LineCounter(file)
+        rows = read_rows(lines)
+        try:
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                _import_chunk(chunk, contacts, report)
+        except UnicodeDecodeError:
+            raise ImportFileError(path, _undecodable_line(path) or lines.line + 1, "the file is not UTF-8 text",
+                                  report.imported, report.merged) from None
+        except csv.Error as error:
+            raise ImportFileError(path, lines.line, f"malformed CSV ({error})", report.imported,
+                                  report.merged) from None
+    return report
@@ -0,0 +1,778 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+from yada.profiling import profiler
+
+
+class RecordIndex:
+    """
+    Maps a lookup key to the records that have it.
+    Records under one key are kept in insertion order and identified by their name.
+    """
+
+    def __init__(self):
+        self._keys = {}
+
+    def add(self, key: str, record):
+        """
+        Adds a record under the given key.
+        :param key:
+        :param record:
+        :return None:
+        """
+        self._keys.setdefault(key, {})[record.name.value] = record
+
+    def discard(self, key: str, record):
+        """
+        Removes a record from the given key if it is there.
+        :param key:
+        :param record:
+        :return None:
+        """
+        records = self._keys.get(key)
+        if records is None:
+            return
+        records.pop(record.name.value, None)
+        if not records:
+            del self._keys[key]
+
+    def get(self, key: str) -> list:
+        """
+        Returns all records stored under the key.
+        :param key:
+        :return list of records:
+        """
+        records = self._keys.get(key)
+        return list(records.values()) if records else []
+
+    def first(self, key: str):
+        """
+        Returns the earliest added record stored under the key.
+        :param key:
+        :return record or None:
+        """
+        records = self._keys.get(key)
+        return next(iter(records.values())) if records else None
+
+    def clear(self):
+        self._keys.clear()
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+
+def _char_masks(pattern: str) -> dict:
+    """
+    Bit masks of the positions of every character in the pattern, for edit_distance.
+    :param pattern:
+    :return dict character -> mask:
+    """
+    masks = {}
+    for i, char in enumerate(pattern):
+        masks[char] = masks.get(char, 0) | 1 << i
+    return masks
+
+
+def edit_distance(pattern: str, text: str, masks: dict = None) -> int:
+    """
+    Levenshtein distance: the number of inserted, deleted or replaced characters turning one string into the other.
+    Uses Myers' bit-parallel algorithm, which keeps a whole column of the distance matrix in one integer,
+    so it makes one pass over the text instead of filling the matrix cell by cell.
+    :param pattern:
+    :param text:
+    :param masks: _char_masks(pattern), when the same pattern is compared with many texts.
+    :return distance:
+    """
+    if not pattern:
+        return len(text)
+    if masks is None:
+        masks = _char_masks(pattern)
+    full = (1 << len(pattern)) - 1
+    last = 1 << (len(pattern) - 1)
+    plus, minus, score = full, 0, len(pattern)
+    for char in text:
+        equal = masks.get(char, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        h_plus = minus | ~(horizontal | plus) & full
+        h_minus = plus & horizontal
+        if h_plus & last:
+            score += 1
+        elif h_minus & last:
+            score -= 1
+        h_plus = (h_plus << 1 | 1) & full
+        h_minus = (h_minus << 1) & full
+        plus = h_minus | ~(vertical | h_plus) & full
+        minus = h_plus & vertical
+    return score
+
+
+class NameIndex:
+    """
+    Bigram index of names for typo-tolerant search.
+    Names are padded with "^" and "$", and one typo changes at most two of their bigrams,
+    so a name within d typos of the query shares at least (bigrams of the query) - 2 * d of them
+    and has to be in one of the 2 * d + 1 rarest ones. Only names found there are compared with the query.
+    """
+
+    def __init__(self):
+        self._grams = {}
+        self._lengths = {}
+
+    @staticmethod
+    def _bigrams(name: str) -> set:
+        padded = f"^{name}$"
+        return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+    def add(self, name: str):
+        """
+        Adds the name if it is not there yet.
+        :param name:
+        :return None:
+        """
+        names = self._lengths.setdefault(len(name), set())
+        if name in names:
+            return
+        names.add(name)
+        for gram in self._bigrams(name):
+            self._grams.setdefault(gram, set()).add(name)
+
+    def discard(self, name: str):
+        """
+        Removes the name if it is there.
+        :param name:
+        :return None:
+        """
+        names = self._lengths.get(len(name))
+        if names is None or name not in names:
+            return
+        names.discard(name)
+        if not names:
+            del self._lengths[len(name)]
+        for gram in self._bigrams(name):
+            postings = self._grams[gram]
+            postings.discard(name)
+            if not postings:
+                del self._grams[gram]
+
+    def _candidates(self, query: str, max_distance: int):
+        grams = self._bigrams(query)
+        threshold = len(grams) - 2 * max_distance
+        if threshold <= 0:
+            # Short queries: every name of a close enough length may match.
+            lengths = range(max(len(query) - max_distance, 0), len(query) + max_distance + 1)
+            candidates = [name for length in lengths for name in self._lengths.get(length, ())]
+            profiler.count("scan", "names by length", len(candidates))
+            return candidates
+        # A name missing from all of the 2 * d + 1 rarest bigrams of the query shares too few of them,
+        # so candidates come from these postings and the others are only probed.
+        postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        rare = postings[:len(grams) - threshold + 1]
+        candidates = {name for names in rare for name in names if abs(len(name) - len(query)) <= max_distance}
+        profiler.count("index", "name bigrams", sum(len(names) for names in rare))
+        return [name for name in candidates
+                if sum(name in names for names in postings) >= threshold]
+
+    def closest(self, query: str, k: int, max_distance: int) -> list:
+        """
+        Finds the k names closest to the query within the given edit distance.
+        :param query:
+        :param k:
+        :param max_distance:
+        :return list of (distance, name) pairs, closest first, ties by name:
+        """
+        if k <= 0:
+            return []
+        masks = _char_masks(query)
+        found = []
+        for name in self._candidates(query, max_distance):
+            distance = edit_distance(query, name, masks)
+            if distance <= max_distance:
+                found.append((distance, name))
+        found.sort()
+        return found[:k]
+
+    def __contains__(self, name):
+        return name in self._lengths.get(len(name), ())
+
+    def __len__(self):
+        return sum(len(names) for names in self._lengths.values())
+
+
+class _TrieNode:
+    __slots__ = ("children", "count")
+
+    def __init__(self):
+        # First character of an edge -> (edge label, child node), None for leaves.
+        self.children = None
+        self.count = 0
+
+
+class PrefixTrie:
+    """
+    Radix tree of words for completion. Chains of nodes with a single child are merged
+    into one edge, so the tree has at most two nodes per word.
+    Completing a prefix walks down the prefix and then only through subtrees that hold words,
+    so its time depends on the prefix and the number of completions, not on the number of words.
+    A word added several times is kept until it is discarded as many times.
+    """
+
+    def __init__(self):
+        self._root = _TrieNode()
+        self._size = 0
+
+    def add(self, word: str):
+        """
+        Adds the word, or counts it once more if it is there.
+        :param word:
+        :return None:
+        """
+        node, rest = self._root, word
+        while rest:
+            if node.children is None:
+                node.children = {}
+            edge = node.children.get(rest[0])
+            if edge is None:
+                child = _TrieNode()
+                node.children[rest[0]] = (rest, child)
+                node = child
+                break
+            label, child = edge
+            common = 1
+            while common < min(len(label), len(rest)) and label[common] == rest[common]:
+                common += 1
+            if common < len(label):
+                middle = _TrieNode()
+                middle.children = {label[common]: (label[common:], child)}
+                node.children[rest[0]] = (label[:common], middle)
+                child = middle
+            node, rest = child, rest[common:]
+        node.count += 1
+        if node.count == 1:
+            self._size += 1
+
+    def discard(self, word: str):
+        """
+        Counts the word once less and removes it when nothing counts it any more.
+        :param word:
+        :return None:
+        """
+        path = []
+        node, rest = self._root, word
+        while rest:
+            edge = node.children.get(rest[0]) if node.children else None
+            if edge is None or not rest.startswith(edge[0]):
+                return
+            path.append((node, rest[0]))
+            node, rest = edge[1], rest[len(edge[0]):]
+        if node.count == 0:
+            return
+        node.count -= 1
+        if node.count:
+            return
+        self._size -= 1
+        for parent, key in reversed(path):
+            self._compact(parent, key)
+
+    @staticmethod
+    def _compact(parent, key):
+        label, node = parent.children[key]
+        if node.count:
+            return
+        if not node.children:
+            del parent.children[key]
+            if not parent.children:
+                parent.children = None
+        elif len(node.children) == 1:
+            child_label, child = next(iter(node.children.values()))
+            parent.children[key] = (label + child_label, child)
+
+    def complete(self, prefix: str, limit: int) -> list:
+        """
+        Returns the first words in alphabetical order that start with the prefix.
+        :param prefix:
+        :param limit: largest number of words to return.
+        :return list of words:
+        """
+        node, rest, word = self._root, prefix, ""
+        while rest:
+            edge = node.children.get(rest[0]) if node.children else None
+            if edge is None:
+                return []
+            label, child = edge
+            if label.startswith(rest):
+                rest = ""
+            elif rest.startswith(label):
+                rest = rest[len(label):]
+            else:
+                return []
+            node, word = child, word + label
+        found = []
+        stack = [(word, node)]
+        while stack and len(found) < limit:
+            word, node = stack.pop()
+            if node.count:
+                found.append(word)
+            if node.children:
+                for key in sorted(node.children, reverse=True):
+                    label, child = node.children[key]
+                    stack.append((word + label, child))
+        return found
+
+    def __contains__(self, word):
+        node, rest = self._root, word
+        while rest:
+            edge = node.children.get(rest[0]) if node.children else None
+            if edge is None or not rest.startswith(edge[0]):
+                return False
+            node, rest = edge[1], rest[len(edge[0]):]
+        return node.count > 0
+
+    def __len__(self):
+        return self._size
+
+
+class _AddressNode:
+    """
+    One level of the address index.
+    Keeps its children sorted by key and counts the records stored below it.
+    """
+
+    def __init__(self):
+        self.children = {}
+        self.keys = []
+        self.records = {}
+
+    def add(self, record):
+        entry = self.records.get(record.name.value)
+        if entry is None:
+            self.records[record.name.value] = [record, 1]
+        else:
+            entry[1] += 1
+
+    def discard(self, record):
+        entry = self.records.get(record.name.value)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self.records[record.name.value]
+
+    def child(self, key: str):
+        node = self.children.get(key)
+        if node is None:
+            node = self.children[key] = _AddressNode()
+            insort(self.keys, key)
+        return node
+
+    def drop_child(self, key: str):
+        del self.children[key]
+        del self.keys[bisect_left(self.keys, key)]
+
+    def prefixed(self, prefix: str):
+        """
+        Yields children whose key starts with the prefix.
+        :param prefix:
+        :return child nodes:
+        """
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            yield self.children[self.keys[i]]
+            i += 1
+
+
+class AddressIndex:
+    """
+    Hierarchical index of addresses: country -> city -> street.
+    The same addresses are also kept under city -> street and street alone,
+    so a query can start at the most specific level it knows.
+    """
+
+    def __init__(self):
+        self._by_country = _AddressNode()
+        self._by_city = _AddressNode()
+        self._by_street = _AddressNode()
+
+    @staticmethod
+    def _paths(address):
+        country, city, street = address.country.lower(), address.city.lower(), address.street.lower()
+        return ((country, city, street), (city, street), (street,))
+
+    def add(self, address, record):
+        """
+        Adds a record under every level of the address.
+        :param address:
+        :param record:
+        :return None:
+        """
+        for root, path in zip(self._roots(), self._paths(address)):
+            node = root
+            node.add(record)
+            for key in path:
+                node = node.child(key)
+                node.add(record)
+
+    def discard(self, address, record):
+        """
+        Removes a record from every level of the address.
+        :param address:
+        :param record:
+        :return None:
+        """
+        for root, path in zip(self._roots(), self._paths(address)):
+            node = root
+            node.discard(record)
+            for key in path:
+                child = node.children.get(key)
+                if child is None:
+                    break
+                child.discard(record)
+                if not child.records:
+                    node.drop_child(key)
+                    break
+                node = child
+
+    def _roots(self):
+        return self._by_country, self._by_city, self._by_street
+
+    def _select(self, country=None, city=None, street=None, prefix=False) -> list:
+        if country is not None:
+            root, path = self._by_country, [country, city, street]
+        elif city is not None:
+            root, path = self._by_city, [city, street]
+        else:
+            root, path = self._by_street, [street]
+        while path and path[-1] is None:
+            path.pop()
+
+        nodes = [root]
+        for level, key in enumerate(path):
+            if key is None:
+                nodes = [child for node in nodes for child in node.children.values()]
+            elif prefix and level == len(path) - 1:
+                nodes = [child for node in nodes for child in node.prefixed(key.lower())]
+            else:
+                nodes = [node.children[key.lower()] for node in nodes if key.lower() in node.children]
+        return nodes
+
+    def find(self, country=None, city=None, street=None, prefix=False) -> list:
+        """
+        Finds records by any combination of country, city and street.
+        With prefix=True the most specific given part is matched as a prefix.
+        :param country:
+        :param city:
+        :param street:
+        :param prefix:
+        :return list of records:
+        """
+        nodes = self._select(country, city, street, prefix)
+        if len(nodes) == 1:
+            return [record for record, _ in nodes[0].records.values()]
+        found = {}
+        for node in nodes:
+            for name, (record, _) in node.records.items():
+                found.setdefault(name, record)
+        return list(found.values())
+
+    def count(self, country=None, city=None, street=None, prefix=False) -> int:
+        """
+        Counts records matching the query without building the result list.
+        :param country:
+        :param city:
+        :param street:
+        :param prefix:
+        :return number of records:
+        """
+        nodes = self._select(country, city, street, prefix)
+        if len(nodes) == 1:
+            return len(nodes[0].records)
+        return len(self.find(country, city, street, prefix))
+
+    def city_counts(self) -> dict:
+        """
+        Returns the number of records for every known city.
+        :return dict city -> count:
+        """
+        return {city: len(node.records) for city, node in self._by_city.children.items()}
+
+
+LEAP_YEAR = 2000
+LEAP_DAY = date(LEAP_YEAR, 2, 29).timetuple().tm_yday
+
+
+def day_of_year(day: date) -> int:
+    """
+    Returns the position of the day in a leap year, so every calendar day keeps one number.
+    :param day:
+    :return day number from 1 to 366:
+    """
+    return date(LEAP_YEAR, day.month, day.day).timetuple().tm_yday
+
+
+class BirthdayIndex:
+    """
+    Sorted calendar of birthdays keyed by day of year.
+    Birthdays on February 29 are celebrated on February 28 in non-leap years.
+    """
+
+    def __init__(self):
+        self._days = []
+        self._records = {}
+
+    def add(self, birthday: date, record):
+        """
+        Adds a record under its birthday.
+        :param birthday:
+        :param record:
+        :return None:
+        """
+        day = day_of_year(birthday)
+        records = self._records.get(day)
+        if records is None:
+            records = self._records[day] = {}
+            insort(self._days, day)
+        records[record.name.value] = record
+
+    def discard(self, birthday: date, record):
+        """
+        Removes a record from its birthday.
+        :param birthday:
+        :param record:
+        :return None:
+        """
+        day = day_of_year(birthday)
+        records = self._records.get(day)
+        if records is None:
+            return
+        records.pop(record.name.value, None)
+        if not records:
+            del self._records[day]
+            del self._days[bisect_left(self._days, day)]
+
+    def on_day(self, day: date) -> list:
+        """
+        Returns records with a birthday on the same day and month.
+        :param day:
+        :return list of records:
+        """
+        return list(self._records.get(day_of_year(day), {}).values())
+
+    def upcoming(self, today: date, days: int) -> list:
+        """
+        Returns the next birthdays within the given number of days starting from today.
+        The range wraps around the end of the year, and each record is returned once.
+        :param today:
+        :param days:
+        :return list of (date, record) pairs ordered by date:
+        """
+        result = []
+        seen = set()
+        for year, first_day, last_day in birthday_periods(today, days):
+            lo = bisect_left(self._days, first_day)
+            hi = bisect_right(self._days, last_day)
+            for day in self._days[lo:hi]:
+                celebration = celebration_date(year, day)
+                for record in self._records[day].values():
+                    if record.name.value not in seen:
+                        seen.add(record.name.value)
+                        result.append((celebration, record))
+        return result
+
+
+def is_leap_year(year: int) -> bool:
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+def celebration_date(year: int, day: int) -> date:
+    """
+    Returns the date a birthday with the given day of year is celebrated in the year.
+    :param year:
+    :param day: day number from day_of_year.
+    :return date:
+    """
+    if day == LEAP_DAY and not is_leap_year(year):
+        return date(year, 2, 28)
+    return (date(LEAP_YEAR, 1, 1) + timedelta(days=day - 1)).replace(year=year)
+
+
+def birthday_periods(today: date, days: int):
+    """
+    Splits the given number of days starting from today into parts that do not cross a year end.
+    The period is capped at one year.
+    :param today:
+    :param days:
+    :return (year, first day, last day) triples in day_of_year numbers, inclusive.
+    In non-leap years a part ending on February 28 also covers February 29 birthdays.
+    """
+    start = today
+    remaining = min(days, 366)
+    while remaining > 0:
+        end = min(start + timedelta(days=remaining - 1), date(start.year, 12, 31))
+        last_day = day_of_year(end)
+        if last_day == LEAP_DAY - 1 and not is_leap_year(start.year):
+            last_day = LEAP_DAY
+        yield start.year, day_of_year(start), last_day
+        remaining -= (end - start).days + 1
+        start = end + timedelta(days=1)
+
+
+class TextIndex:
+    """
+    Inverted index of texts for case-insensitive search.
+    Substring queries intersect trigram postings and then confirm the match.
+    """
+
+    GRAM_SIZE = 3
+
+    def __init__(self):
+        self._texts = {}
+        self._grams = {}
+
+    def _trigrams(self, text: str) -> set:
+        return {text[i:i + self.GRAM_SIZE] for i in range(len(text) - self.GRAM_SIZE + 1)}
+
+    def add(self, doc_id, text: str):
+        """
+        Indexes the text under the document id, replacing its previous text.
+        :param doc_id:
+        :param text:
+        :return None:
+        """
+        self.discard(doc_id)
+        text = text.lower()
+        self._texts[doc_id] = text
+        for gram in self._trigrams(text):
+            self._grams.setdefault(gram, set()).add(doc_id)
+
+    def discard(self, doc_id):
+        """
+        Removes the document from the index if it is there.
+        :param doc_id:
+        :return None:
+        """
+        text = self._texts.pop(doc_id, None)
+        if text is None:
+            return
+        for gram in self._trigrams(text):
+            ids = self._grams[gram]
+            ids.discard(doc_id)
+            if not ids:
+                del self._grams[gram]
+
+    @staticmethod
+    def _intersect(postings: list) -> set:
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, query: str) -> set:
+        """
+        Finds documents whose text contains the query, ignoring case.
+        Queries shorter than a trigram are checked against the stored lowercase texts.
+        :param query:
+        :return set of document ids:
+        """
+        query = query.lower()
+        if len(query) < self.GRAM_SIZE:
+            profiler.count("scan", "note texts", len(self._texts))
+            return {doc_id for doc_id, text in self._texts.items() if query in text}
+        profiler.count("index", "trigrams")
+        postings = [self._grams.get(gram) for gram in self._trigrams(query)]
+        if not all(postings):
+            return set()
+        candidates = self._intersect(postings)
+        if len(query) == self.GRAM_SIZE:
+            return candidates
+        profiler.count("scan", "trigram candidates", len(candidates))
+        return {doc_id for doc_id in candidates if query in self._texts[doc_id]}
+
+
+class TagIndex:
+    """
+    Maps case-folded tags to the ids of documents that carry them.
+    Keeps the tags in a prefix trie as well, for completion.
+    """
+
+    def __init__(self):
+        self._tags = {}
+        self._trie = PrefixTrie()
+
+    def add(self, tag: str, doc_id):
+        """
+        Adds the document under the tag.
+        :param tag:
+        :param doc_id:
+        :return None:
+        """
+        key = tag.casefold()
+        ids = self._tags.get(key)
+        if ids is None:
+            ids = self._tags[key] = {}
+            self._trie.add(key)
+        ids[doc_id] = None
+
+    def discard(self, tag: str, doc_id):
+        """
+        Removes the document from the tag if it is there.
+        :param tag:
+        :param doc_id:
+        :return None:
+        """
+        key = tag.casefold()
+        ids = self._tags.get(key)
+        if ids is None:
+            return
+        ids.pop(doc_id, None)
+        if not ids:
+            del self._tags[key]
+            self._trie.discard(key)
+
+    def get(self, tag: str) -> list:
+        """
+        Returns ids of documents with the tag.
+        :param tag:
+        :return list of ids:
+        """
+        return list(self._tags.get(tag.casefold(), ()))
+
+    def find_all(self, tags: list) -> set:
+        """
+        Returns ids of documents that have every given tag.
+        :param tags:
+        :return set of ids:
+        """
+        postings = sorted((self._tags.get(tag.casefold(), {}) for tag in tags), key=len)
+        if not postings:
+            return set()
+        return set(postings[0]).intersection(*postings[1:])
+
+    def find_any(self, tags: list) -> set:
+        """
+        Returns ids of documents that have at least one of the given tags.
+        :param tags:
+        :return set of ids:
+        """
+        return set().union(*(self._tags.get(tag.casefold(), {}) for tag in tags))
+
+    def complete(self, prefix: str, limit: int) -> list:
+        """
+        Returns the first tags in alphabetical order that start with the prefix, ignoring case.
+        :param prefix:
+        :param limit:
+        :return list of case-folded tags:
+        """
+        return self._trie.complete(prefix.casefold(), limit)
+
+    def counts(self) -> dict:
+        """
+        Returns the number of documents for every tag, sorted by tag.
+        :return dict tag -> count:
+        """
+        return {tag: len(self._tags[tag]) for tag in sorted(self._tags)}
+
+    def __iter__(self):
+        return iter(sorted(self._tags))
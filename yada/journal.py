@@ -0,0 +1,142 @@
+import os
+import struct
+
+JOURNAL_SUFFIX = ".journal"
+# The journal is folded into a new snapshot once it grows past this size in bytes.
+JOURNAL_LIMIT = 1024 * 1024
+# Commits changing more records than this, such as imports, write a new snapshot right away.
+JOURNAL_BULK_CHANGES = 1000
+
+_ENTRY_HEADER = struct.Struct(">I")
+
+
+def journal_path(path="data"):
+    """
+    Returns the name of the journal file that belongs to the snapshot.
+    :param path:
+    :return journal file name:
+    """
+    return path + JOURNAL_SUFFIX
+
+
+def _remove_journal(path):
+    if os.path.exists(journal_path(path)):
+        os.remove(journal_path(path))
+
+
+def write_snapshot(contacts, path="data"):
+    """
+    Atomically replaces the snapshot with the whole address book and drops the journal,
+    since everything it recorded is now part of the snapshot.
+    :param contacts:
+    :param path:
+    :return None:
+    """
+    contacts.save_snapshot(path)
+    _remove_journal(path)
+
+
+def encode_journal(changes: dict) -> bytes:
+    """
+    Encodes changed records as journal entries. A record of None means the contact was deleted.
+    :param changes: dict name -> Record or None.
+    :return bytes:
+    """
+    import pickle
+    entries = []
+    for name, record in changes.items():
+        entry = pickle.dumps((name, record))
+        entries.append(_ENTRY_HEADER.pack(len(entry)) + entry)
+    return b"".join(entries)
+
+
+def append_journal(entries: bytes, path="data"):
+    """
+    Appends encoded entries to the journal. If the write fails, the journal is cut back to where it was.
+    :param entries: bytes made by encode_journal.
+    :param path:
+    :return None:
+    """
+    with open(journal_path(path), "ab") as file:
+        start = file.tell()
+        try:
+            file.write(entries)
+            file.flush()
+        except BaseException:
+            # A torn entry followed by later ones would hide them from replay_journal.
+            file.truncate(start)
+            raise
+
+
+def replay_journal(contacts, path="data"):
+    """
+    Applies the journal on top of an address book loaded from the snapshot.
+    A torn entry at the end of the file, left by an interrupted write, is ignored.
+    :param contacts:
+    :param path:
+    :return None:
+    """
+    try:
+        file = open(journal_path(path), "rb")
+    except FileNotFoundError:
+        return
+    import pickle
+    with file:
+        while True:
+            header = file.read(_ENTRY_HEADER.size)
+            if len(header) < _ENTRY_HEADER.size:
+                break
+            size, = _ENTRY_HEADER.unpack(header)
+            entry = file.read(size)
+            if len(entry) < size:
+                break
+            name, record = pickle.loads(entry)
+            if record is not None:
+                contacts[name] = record
+            elif name in contacts:
+                del contacts[name]
+    contacts.pop_changes()
+
+
+def prepare_journal(contacts, changes: dict, path="data", limit=JOURNAL_LIMIT):
+    """
+    Encodes what a commit of the changes writes, so the files can be written later without the address book.
+    That is the journal entries, or a new snapshot of the whole book when there is no snapshot yet,
+    the journal would outgrow the limit or the commit changes more than JOURNAL_BULK_CHANGES records.
+    :param contacts:
+    :param changes: dict name -> Record or None, taken from the address book by pop_changes.
+    :param path:
+    :param limit:
+    :return function writing the files:
+    """
+    if os.path.exists(path) and len(changes) <= JOURNAL_BULK_CHANGES:
+        entries = encode_journal(changes)
+        journal = journal_path(path)
+        if (os.path.getsize(journal) if os.path.exists(journal) else 0) + len(entries) <= limit:
+            return lambda: append_journal(entries, path)
+    write = contacts.snapshot_writer(path)
+
+    def replace_snapshot():
+        write()
+        _remove_journal(path)
+
+    return replace_snapshot
+
+
+def commit_journal(contacts, path="data", limit=JOURNAL_LIMIT):
+    """
+    Persists the changes made to the address book since the last commit.
+    Nothing is written when there are no changes. If the write fails, the changes are kept for the next commit.
+    :param contacts:
+    :param path:
+    :param limit:
+    :return None:
+    """
+    changes = contacts.pop_changes()
+    if not changes:
+        return
+    try:
+        prepare_journal(contacts, changes, path, limit)()
+    except Exception:
+        contacts.restore_changes(changes)
+        raise
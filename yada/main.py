@@ -1,15 +1,30 @@
-import pickle
+import sys
+
+from yada.startup import StartupReport
+
+# Created before the other imports, so that --startup-report can time them.
+startup_report = StartupReport()
+if "--startup-report" in sys.argv:
+    startup_report.trace_imports()
+
+import argparse
+import time
 from datetime import datetime
-from yada.address_book import Record
+from yada.address_book import Record, normalize_phone
+from yada.autosave import AUTOSAVE_DELAY, FLUSH_TIMEOUT, Autosave
 from yada.birthday_reminder import get_birthdays_per_week
+from yada.render import parse_page_options, print_page, render_table, select_page
 from yada.notebook import (Notebook, add_note, add_tag_to_note, delete_note, delete_tag,
                            edit_note, search_notes_by_tag, search_notes_by_text, show_all_notes, sort_notes_by_tags)
-from prompt_toolkit import prompt
-from prompt_toolkit.completion import WordCompleter
-from tabulate import tabulate
 from yada.exceptions import *
-from yada.logo import logo
-from yada.jokes import get_joke
+from yada.profiling import PHASES, profiler, run_with_cprofile, run_with_tracemalloc
+from yada.session import Session
+from yada.storage import STORAGE_NAMES, get_storage
+from yada.validation import validate_phone
+
+CONTACT_SORT_KEYS = ("name", "birthday")
+# Commands taking file paths, their arguments keep their case.
+PATH_COMMANDS = ("import", "export", "export-notes")
 
 
 # function block
@@ -24,7 +39,8 @@ def parse_input(user_input: str):
     """
     cmd, *args = user_input.split()
     cmd = cmd.strip().lower()
-    args = [arg.lower() for arg in args]
+    if cmd not in PATH_COMMANDS:
+        args = [arg.lower() for arg in args]
     return cmd, *args
 
 
@@ -45,9 +61,11 @@ def add_contact(args: list, contacts: AddressBook):
         user = contacts[name]
         user.add_phone(phone)
     else:
+        validate_phone(phone)
         user = Record(name)
         user.add_phone(phone)
         contacts.add_record(user)
+    print(f"{Color.GREEN}Contacts updated.\n{Color.RESET}")
 
 
 @input_error
@@ -85,13 +103,12 @@ def change_contact(args: list, contacts: AddressBook):
     if name not in contacts:
         print(f"{Color.RED}Contact not found.\n{Color.RESET}")
         return None
-    for u_name, record in contacts.data.items():
-        if u_name == name:
-            if record.find_phone(old_phone):
-                record.edit_phone(old_phone, new_phone)
-                break
-            else:
-                print(f"{Color.RED}Old phone number not found.\n{Color.RESET}")
+    record = contacts[name]
+    if record.find_phone(old_phone):
+        record.edit_phone(old_phone, new_phone)
+        print(f"{Color.GREEN}Contacts updated.\n{Color.RESET}")
+    else:
+        print(f"{Color.RED}Old phone number not found.\n{Color.RESET}")
 
 
 @input_error
@@ -114,8 +131,32 @@ def find_by_name(args: list, contacts: AddressBook):
         data.append([name.title(), [phone.value for phone in contacts[name].phones]])
     else:
         raise KeyError
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
+
+
+@input_error
+def find_by_fuzzy_name(args: list, contacts: AddressBook):
+    """
+    Prints the contacts whose names are closest to the given one, so a mistyped name still finds them.
+    :param args: name and, optionally, the number of contacts to show.
+    :param contacts:
+    :return None:
+    """
+    headers = ["Name", "Typos", "Phone"]
+    try:
+        name, *rest = args
+        k = int(rest[0]) if rest else 5
+    except ValueError:
+        raise FindFuzzyValueError
+    if len(rest) > 1 or k < 1:
+        raise FindFuzzyValueError
+    found = contacts.find_fuzzy(name, k)
+    if not found:
+        print(f"{Color.RED}No contact has a name close to '{name}'.\n{Color.RESET}")
+        return
+    data = [[record.name.value.title(), distance, [phone.value for phone in record.phones]]
+            for distance, record in found]
+    print(render_table(headers, data))
 
 
 @input_error
@@ -129,7 +170,7 @@ def find_by_phone(args: list, contacts: AddressBook):
     KeyError if the contact does not exist :
     """
     try:
-        if len(args[0]) != 10:
+        if len(normalize_phone(args[0])) != 10:
             raise PhoneLengthError
     except IndexError:
         raise FindPhoneIndexError
@@ -141,8 +182,7 @@ def find_by_phone(args: list, contacts: AddressBook):
         data.append([result.name.value.capitalize(), args[0]])
     else:
         raise KeyError
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
 
 
 @input_error
@@ -171,8 +211,7 @@ def find_by_birthday(args: list, contacts: AddressBook):
             data.append([result.name.value.capitalize(), result.birthday])
     else:
         raise BirthdayNotFoundError
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
 
 
 @input_error
@@ -200,87 +239,105 @@ def find_by_email(args: list, contacts: AddressBook):
     else:
         raise KeyError
 
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
 
 
 @input_error
 def find_by_address(args: list, contacts: AddressBook):
     """
-    Returns the name and birthday if the contact is found by address.
+    Returns the name and address if the contact is found by city and optionally street,
+    in a country given with "--country", or by the country alone.
+    A trailing "*" on the most specific part matches it as a prefix, "*" anywhere else is rejected.
     KeyError if the contact does not exist.
     :param args:
     :param contacts:
-    return The name and birthday if the contact is found.
+    return The name and address if the contact is found.
     KeyError if the contact does not exist.
     """
-    try:
-        address_to_find = args[0]
-    except IndexError:
-        raise FindBirthdayIndexError
+    country = None
+    if "--country" in args:
+        position = args.index("--country")
+        if position + 1 >= len(args):
+            raise FindAddressIndexError
+        country = args[position + 1]
+        args = args[:position] + args[position + 2:]
+    if len(args) > 2 or (not args and country is None):
+        raise FindAddressIndexError
+    parts = [part for part in [country, *args] if part is not None]
+    if any("*" in part for part in parts[:-1]) or "*" in parts[-1][:-1]:
+        raise FindAddressIndexError
+    prefix = parts[-1].endswith("*")
+    if country is not None:
+        country = country.rstrip("*")
+    city, street = [arg.rstrip("*") for arg in args] + [None] * (2 - len(args))
 
     data = []
     headers = ["Name", "Address"]
-    results = contacts.find_by_address(address_to_find)
+    results = contacts.find_by_address(city, street, country, prefix=prefix)
 
     if results:
         for result in results:
             search_address = '\n'.join(
-                [address.value for address in result.addresses if address_to_find.lower() in address.value.lower()])
+                [address.value for address in result.addresses
+                 if address.matches(country=country, city=city, street=street, prefix=prefix)])
             data.append([result.name.value.capitalize(), search_address])
     else:
         raise KeyError
 
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
 
 
-def get_all_phones(args, contacts: AddressBook):
+@input_error
+def count_by_city(args: list, contacts: AddressBook):
     """
-    Return all saved contacts with phone numbers and birthdays to the console, if any.
-    Addresses are displayed only once in the specified format.
+    Prints the number of contacts living in every city, the most populated first.
     :param args:
     :param contacts:
-    :return all saved contacts:
+    :return None:
     """
-    data = []
-    headers = ["Name", "Phones", "Emails", "Birthday", "Addresses"]
-    if len(contacts) == 0:
-        print(f"{Color.RED}There are still no entries in your notebook. Try making one.\n{Color.RESET}")
-    else:
-        for name, record in contacts.data.items():
-            addresses_str = '\n'.join([address.value for address in record.addresses])
-            phones_str = '\n'.join([phone.value for phone in record.phones])
-            email_str = '\n'.join([email.value for email in record.emails])
-
-            data.append([name.title(), phones_str, email_str, record.birthday, addresses_str])
-        table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-        print(table)
+    counts = contacts.count_by_city()
+    if not counts:
+        print(f"{Color.RED}No contact has an address yet.{Color.RESET}\n")
+        return
+    rows = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    print(render_table(["City", "Contacts"], [[city.title(), count] for city, count in rows]))
 
 
-@open_file_error
-def read_data(path="data"):
-    """
-    Read users from the given file using "pickle" package.
-    By default, path = "data".
-    :param path:
-    :return AddressBook:
-    """
-    with open(path, "rb") as file:
-        unpacked = pickle.load(file)
-    return unpacked
+def _birthday_sort_key(record: Record):
+    return getattr(record.birthday, "birthday", None)
 
 
-def write_data(contacts: AddressBook, path="data"):
+@input_error
+def get_all_phones(args, contacts: AddressBook):
     """
-    Write contacts to the given file using "pickle" package.
-    By default path = "data".
+    Return one page of saved contacts with phone numbers and birthdays to the console, if any.
+    Only the contacts on the requested page are loaded and formatted.
+    :param args: optional --page N, --limit N, --sort name|birthday and --reverse.
     :param contacts:
-    :param path:
-    :return  None:
+    :return None:
     """
-    with open(path, "wb") as file:
-        pickle.dump(contacts, file)
+    try:
+        options = parse_page_options(args, CONTACT_SORT_KEYS)
+    except ValueError:
+        raise ShowAllValueError
+    headers = ["Name", "Phones", "Emails", "Birthday", "Addresses"]
+    total = len(contacts)
+    if total == 0:
+        print(f"{Color.RED}There are still no entries in your notebook. Try making one.\n{Color.RESET}")
+        return
+    if options.sort == "birthday":
+        records = select_page(contacts.values(), options, _birthday_sort_key)
+    else:
+        names = select_page(iter(contacts), options, str if options.sort == "name" else None)
+        records = [contacts[name] for name in names]
+    data = []
+    for record in records:
+        addresses_str = '\n'.join([address.value for address in record.addresses])
+        phones_str = '\n'.join([phone.value for phone in record.phones])
+        email_str = '\n'.join([email.value for email in record.emails])
+
+        data.append([record.name.value.title(), phones_str, email_str, record.birthday, addresses_str])
+    print_page(headers, data, options, total, "contacts", CONTACT_SORT_KEYS)
 
 
 def user_help(*args, **kwargs):
@@ -298,8 +355,10 @@ def user_help(*args, **kwargs):
         [4, "find-name", "<phone>", "Returns the phone number and the contact to whom it belongs."],
         [5, "find-email", "<email>", "Returns the email and the contact to whom it belongs."],
         [6, "find-birthday", "<birthday>", "Returns the names of contacts who have a birthday on this day."],
-        [7, "find-address", "<address>", "Returns the name of the contact that has the following address."],
-        [8, "all", "", "Return all saved contacts with p_numbers, birthdays and addresses."],
+        [7, "find-address", "<city> [street]\n [--country <country>]",
+         "Returns the contacts living at this address, 'kyi*' matches a prefix of the last part."],
+        [8, "all", "[--page N] [--limit N]\n [--sort name|birthday] [--reverse]",
+         "Return saved contacts with p_numbers, birthdays and addresses, one page at a time."],
         [9, "add-birthday", "<name> <DD.MM.YYYY>", "Adding a birthday date to the contact."],
         [10, "show-birthday", "<name>", "Return birthday of the requested user from contacts."],
         [11, "birthdays", "", "Print a list of people who need to be greeted by days in the n_week."],
@@ -312,15 +371,24 @@ def user_help(*args, **kwargs):
         [18, "edit-email", "<name> <old email address>\n <new email address>", "Changes the email address."],
         [19, "add-tag", "<note id> <tag>", "Adds tag to chosen note."],
         [20, "delete-tag", "<note id> <tag>", "Deletes tag of chosen note."],
-        [21, "search-notes-by-tag", "<tag>", "Searching notes in user's notebook by specified tag."],
-        [22, "all-notes", "", "Prints all notes for the user."],
-        [23, "sort-notes", "", "Prints all notes sorted by tags."],
-        [24, "close/Exit", "", "Exit the program."],
-        [25, "tell-a-joke", "", "Returns a random joke."]
+        [21, "search-notes-by-tag", "<tag> [tag ...] [--any]",
+         "Searching notes having all specified tags, or any of them with --any."],
+        [22, "all-notes", "[--page N] [--limit N]\n [--sort id|text|tags] [--reverse]",
+         "Prints the user's notes, one page at a time."],
+        [23, "sort-notes", "", "Prints all notes sorted by tags with the number of notes per tag."],
+        [24, "import", "<path> [csv|vcard]", "Imports contacts from a CSV or vCard file."],
+        [25, "export", "<path or -> [csv|jsonl|vcard]", "Exports all contacts to a file or, with '-', the screen."],
+        [26, "export-notes", "<path or -> [csv|jsonl]", "Exports all notes to a file or, with '-', the screen."],
+        [27, "close/Exit", "", "Exit the program."],
+        [28, "tell-a-joke", "", "Returns a random joke."],
+        [29, "stats", "", "Shows time per command and phase and index lookups, with --profile."],
+        [30, "profile", "<command> [arguments]", "Runs the command under cProfile and saves the statistics."],
+        [31, "trace-memory", "<command> [arguments]", "Runs the command tracing memory and saves the snapshot."],
+        [32, "find-fuzzy", "<name> [k]", "Returns up to k contacts (5 by default) with names closest to a mistyped one."],
+        [33, "count-by-city", "", "Returns the number of contacts living in every city."]
     ]
     headers = ["#", "Command", "Arguments", "Description"]
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
+    print(render_table(headers, data))
 
 
 @input_error
@@ -343,6 +411,7 @@ def add_birthday(args, contacts: AddressBook):
             raise BirthdayConflictError
 
         user.add_birthday(birthday)
+        print(f"{Color.GREEN}Birthday added.{Color.RESET}\n")
     else:
         raise BirthdayKeyError
 
@@ -401,6 +470,7 @@ def add_email(args: list, contacts: AddressBook):
     if name in contacts:
         user = contacts[name]
         user.add_email(email)
+        print(f"{Color.GREEN}Email added.{Color.RESET}")
     else:
         raise AttributeError
 
@@ -418,78 +488,384 @@ def edit_email(args: list, contacts: AddressBook):
         raise EditEmailValueError()
     if name in contacts:
         user = contacts[name]
-        user.edit_email(old_email, new_email)
+        if user.edit_email(old_email, new_email):
+            print(f"{Color.GREEN}Email updated.{Color.RESET}")
+        else:
+            print(f"{Color.RED}Old email not found.{Color.RESET}")
     else:
         raise KeyError
 
 
+@input_error
+def import_file(args: list, contacts: AddressBook):
+    """
+    Imports contacts from a CSV or vCard file.
+    :param args: path and optionally the format, "csv" or "vcard".
+    :param contacts:
+    :return None:
+    """
+    try:
+        path, *file_format = args
+    except ValueError:
+        raise ImportIndexError
+    from yada.importer import IMPORT_FORMATS, import_contacts
+    if len(file_format) > 1 or (file_format and file_format[0].lower() not in IMPORT_FORMATS):
+        raise ImportIndexError
+    report = import_contacts(path, contacts, file_format[0].lower() if file_format else None)
+    print(f"{Color.GREEN}Imported {report.imported} new contacts.{Color.RESET}")
+    if report.merged or report.unchanged:
+        print(f"{Color.GREEN}Merged {report.merged} entries into existing contacts, "
+              f"{report.unchanged} had nothing new.{Color.RESET}")
+    if report.error_count:
+        print(f"{Color.RED}{report.error_count} entries were skipped:{Color.RESET}")
+        for error in report.errors:
+            print(f"  {error}")
+        if report.error_count > len(report.errors):
+            print(f"  ... and {report.error_count - len(report.errors)} more")
+    print()
+
+
+def _export_arguments(args: list, formats: tuple):
+    """
+    Splits export arguments into the path and the format.
+    :return (path, format or None), or None if the arguments are wrong:
+    """
+    if not 1 <= len(args) <= 2:
+        return None
+    path, *file_format = args
+    if file_format and file_format[0].lower() not in formats:
+        return None
+    return path, file_format[0].lower() if file_format else None
+
+
+def _print_exported(count: int, what: str, path: str):
+    from yada.exporter import STDOUT_PATH
+    if path != STDOUT_PATH:
+        print(f"{Color.GREEN}Exported {count} {what} to {path}.{Color.RESET}\n")
+
+
+@input_error
+def export_file(args: list, contacts: AddressBook):
+    """
+    Exports all contacts to a CSV, JSON Lines or vCard file, or to the standard output with "-".
+    :param args: path and optionally the format.
+    :param contacts:
+    :return None:
+    """
+    from yada.exporter import CONTACT_EXPORT_FORMATS, export_contacts
+    arguments = _export_arguments(args, CONTACT_EXPORT_FORMATS)
+    if arguments is None:
+        raise ExportIndexError
+    path, file_format = arguments
+    _print_exported(export_contacts(contacts, path, file_format), "contacts", path)
+
+
+@input_note_error
+def export_notes_file(notebook: Notebook, args: list):
+    """
+    Exports all notes to a CSV or JSON Lines file, or to the standard output with "-".
+    :param notebook:
+    :param args: path and optionally the format.
+    :return None:
+    """
+    from yada.exporter import NOTE_EXPORT_FORMATS, detect_export_format, export_notes
+    arguments = _export_arguments(args, NOTE_EXPORT_FORMATS)
+    if arguments is None:
+        raise ExportNotesError
+    path, file_format = arguments
+    # A path like notes.vcf names a format that notes can't be exported in.
+    file_format = file_format or detect_export_format(path)
+    if file_format not in NOTE_EXPORT_FORMATS:
+        raise ExportNotesError
+    _print_exported(export_notes(notebook, path, file_format), "notes", path)
+
+
 # main block
 
-def main():
-    contacts = read_data()
-    notebook = Notebook()
-    address_book_menu = {
-        "add": add_contact,
-        'remove': remove_contact,
-        "change": change_contact,
-        "find-name": find_by_name,
-        "find-phone": find_by_phone,
-        "find-email": find_by_email,
-        "find-birthday": find_by_birthday,
-        "find-address": find_by_address,
-        "all": get_all_phones,
-        "help": user_help,
-        "add-birthday": add_birthday,
-        "show-birthday": show_birthday,
-        "birthdays": get_birthdays_per_week,
-        "add-address": add_address,
-        "add-email": add_email,
-        "edit-email": edit_email,
-    }
-    notebook_menu = {
-        "add-note": add_note,
-        "edit-note": edit_note,
-        "search-notes-by-text": search_notes_by_text,
-        "search-notes-by-tag": search_notes_by_tag,
-        "delete-note": delete_note,
-        "all-notes": show_all_notes,
-        "add-tag": add_tag_to_note,
-        "delete-tag": delete_tag,
-        "sort-notes": sort_notes_by_tags
-    }
-    menu = list(address_book_menu.keys()) + list(notebook_menu.keys())
-    commands_list = list(menu) + ["close", "exit", "good bye", "hello", "tell-a-joke"]
-    completer = WordCompleter(commands_list)
+ADDRESS_BOOK_MENU = {
+    "add": add_contact,
+    'remove': remove_contact,
+    "change": change_contact,
+    "find-name": find_by_name,
+    "find-fuzzy": find_by_fuzzy_name,
+    "find-phone": find_by_phone,
+    "find-email": find_by_email,
+    "find-birthday": find_by_birthday,
+    "find-address": find_by_address,
+    "count-by-city": count_by_city,
+    "all": get_all_phones,
+    "add-birthday": add_birthday,
+    "show-birthday": show_birthday,
+    "birthdays": get_birthdays_per_week,
+    "add-address": add_address,
+    "add-email": add_email,
+    "edit-email": edit_email,
+    "import": import_file,
+    "export": export_file,
+}
+NOTEBOOK_MENU = {
+    "add-note": add_note,
+    "edit-note": edit_note,
+    "search-notes-by-text": search_notes_by_text,
+    "search-notes-by-tag": search_notes_by_tag,
+    "delete-note": delete_note,
+    "all-notes": show_all_notes,
+    "add-tag": add_tag_to_note,
+    "delete-tag": delete_tag,
+    "sort-notes": sort_notes_by_tags,
+    "export-notes": export_notes_file,
+}
+EXIT_COMMANDS = ("close", "exit", "good bye")
+# Commands that run the rest of the line under cProfile or tracemalloc.
+PROFILE_COMMANDS = ("profile", "trace-memory")
+COMMANDS = (list(ADDRESS_BOOK_MENU) + list(NOTEBOOK_MENU)
+            + ["help", "hello", "tell-a-joke", "stats", *PROFILE_COMMANDS, *EXIT_COMMANDS])
+
+
+def show_stats():
+    """
+    Prints the time spent per command and phase and the index lookups against scans, collected with --profile.
+    :return None:
+    """
+    if not profiler.enabled:
+        print(f"{Color.RED}Statistics are collected only when yada is started with --profile.\n{Color.RESET}")
+        return
+    if not profiler.commands:
+        print(f"{Color.YELLOW}No commands were timed yet.\n{Color.RESET}")
+        return
+    print(render_table(["Command", "Calls", "Total ms", "Mean ms", "Max ms"] + [f"{phase} ms" for phase in PHASES],
+                       profiler.command_rows()))
+    if profiler.lookups:
+        print(render_table(["Lookup", "Of", "Calls", "Entries"], profiler.lookup_rows()))
+    print()
+
+
+def run_profiled(session: Session, tool: str, user_input: str):
+    """
+    Runs one command under cProfile ("profile") or tracemalloc ("trace-memory") and saves the result to a file.
+    :param session:
+    :param tool: "profile" or "trace-memory".
+    :param user_input: the command to run.
+    :return None:
+    """
+    if not user_input.strip():
+        print(f"{Color.RED}Enter a command in this format{Color.RESET} --->>>"
+              f" {Color.YELLOW}<{tool}> <command> <*arguments>\n{Color.RESET}")
+        return
+    name = user_input.split()[0].lower()
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    if tool == "profile":
+        path = f"yada-{name}-{stamp}.prof"
+        run_with_cprofile(lambda: run_command(session, user_input), path)
+    else:
+        path = f"yada-{name}-{stamp}.tracemalloc"
+        run_with_tracemalloc(lambda: run_command(session, user_input), path)
+    print(f"{Color.GREEN}Saved to {path}.{Color.RESET}\n")
+
+
+def run_command(session: Session, user_input: str) -> bool:
+    """
+    Runs one command line. Contacts or notes are loaded by the first command that needs them
+    and their changes are committed as often as the session asks for, by default right after the command.
+    :param session:
+    :param user_input:
+    :return False if the command asks to exit, True otherwise:
+    """
+    words = user_input.split(maxsplit=1)
+    if words and words[0].lower() in PROFILE_COMMANDS:
+        run_profiled(session, words[0].lower(), words[1] if len(words) > 1 else "")
+        return True
+    with session.lock, profiler.command(words[0].lower() if words else ""):
+        return _dispatch(session, user_input)
+
+
+def _dispatch(session: Session, user_input: str) -> bool:
+    with profiler.phase("parse"):
+        command, *args = parse_input(user_input) if user_input.strip() else " "
+    if command in EXIT_COMMANDS:
+        print(f"{Color.YELLOW_BOLD}Good bye!{Color.RESET}")
+        return False
+    elif command == "hello":
+        print("How can I help you?\n")
+    elif command == "help":
+        user_help()
+    elif command == "stats":
+        show_stats()
+    elif command in ADDRESS_BOOK_MENU:
+        ADDRESS_BOOK_MENU[command](args, session.contacts)
+        save_changes(session.command_done)
+    elif command in NOTEBOOK_MENU:
+        NOTEBOOK_MENU[command](session.notebook, args)
+        save_changes(session.command_done)
+    elif command == "tell-a-joke":
+        from yada.jokes import get_joke
+        print(f'{Color.YELLOW_BOLD}{get_joke()}{Color.RESET}\n')
+    else:
+        print(f"{Color.RED}Invalid command. Print 'Help' to see all commands.\n{Color.RESET}")
+    return True
+
+
+def prompt_commands(session: Session, show_report=False):
+    """
+    Reads commands from the terminal, completing commands, contact names and tags while typing.
+    prompt_toolkit is imported only here.
+    :param session: source of the names and tags to complete.
+    :param show_report: print the startup report right before the first prompt.
+    :return generator of command lines:
+    """
+    with startup_report.measure("import prompt_toolkit"):
+        from prompt_toolkit import prompt
+        from yada.completion import AssistantCompleter
+        from yada.logo import logo
+    completer = AssistantCompleter(session, COMMANDS)
     print(logo)
     print(
         f"{Color.MAGENTA_BOLD}Welcome to the assistant bot!{Color.RESET}\nPrint {Color.YELLOW_BOLD}'Help'{Color.RESET}"
         f" to see all commands.\n")
+    if show_report:
+        startup_report.mark("ready for input")
+        startup_report.print_report()
     while True:
         try:
-            user_input = prompt("Enter a command: ", completer=completer, complete_while_typing=False)
-        except KeyboardInterrupt:
+            yield prompt("Enter a command: ", completer=completer, complete_while_typing=True)
+        except (KeyboardInterrupt, EOFError):
             print(f"You pressed Ctrl+C! Exiting. {Color.YELLOW_BOLD}Good bye!{Color.RESET}")
-            write_data(contacts)
-            notebook.save_notes()
-            break
-        command, *args = parse_input(user_input) if len(user_input) > 0 else " "
-        if command in ["close", "exit", "good bye"]:
-            print(f"{Color.YELLOW_BOLD}Good bye!{Color.RESET}")
-            write_data(contacts)
-            notebook.save_notes()
-            break
-        elif command == "hello":
-            print("How can I help you?\n")
-        elif command in address_book_menu:
-            address_book_menu[command](args, contacts)
-            write_data(contacts)
-        elif command in notebook_menu:
-            notebook_menu[command](notebook, args)
-            notebook.save_notes()
-        elif command == "tell-a-joke":
-            print(f'{Color.YELLOW_BOLD}{get_joke()}{Color.RESET}\n')
+            return
+
+
+def read_commands(file):
+    """
+    Reads commands line by line from a file or a pipe, without prompts.
+    Blank lines and lines starting with "#" are skipped, so scripts can carry comments.
+    :param file:
+    :return generator of command lines:
+    """
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            yield line
+
+
+def run_batch(session: Session, path: str):
+    """
+    Runs the commands of a script file, or of the standard input when the path is "-".
+    Changes are committed by the session every commit_every commands and once more at the end by main.
+    :param session:
+    :param path:
+    :return number of commands run:
+    """
+    try:
+        file = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    except OSError as error:
+        print(f"{Color.RED}Can't read the batch file: {error.strerror}.{Color.RESET}")
+        return 0
+    count = 0
+    try:
+        for user_input in read_commands(file):
+            count += 1
+            if not run_command(session, user_input):
+                break
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    return count
+
+
+def save_changes(commit) -> bool:
+    """
+    Runs a commit of the session. A commit that fails is reported, and its changes stay pending for the next one.
+    :param commit: session.commit, or session.command_done that commits when it is time.
+    :return True if nothing failed:
+    """
+    from yada.snapshot import SnapshotError
+    try:
+        commit()
+    except (OSError, SnapshotError) as error:
+        print(f"{Color.RED}Changes were not saved: {error}{Color.RESET}\n")
+        return False
+    return True
+
+
+def close_session(session: Session):
+    """
+    Writes what is left to save and closes the storage.
+    A background save gets FLUSH_TIMEOUT seconds, after that the assistant exits without waiting for it.
+    :param session:
+    :return None:
+    """
+    if session.autosave is not None and not session.autosave.close(FLUSH_TIMEOUT):
+        if session.autosave.error is None:
+            # The write is still running and needs the storage, it ends with the process.
+            print(f"{Color.RED}Saving took longer than {FLUSH_TIMEOUT:g} s, the last changes may be lost.{Color.RESET}")
+            return
+        print(f"{Color.RED}The last changes were not saved: {session.autosave.error}{Color.RESET}")
+    else:
+        save_changes(session.commit)
+    session.close()
+
+
+def parse_arguments(argv=None):
+    """
+    Parses the command line options.
+    :param argv:
+    :return argparse.Namespace:
+    """
+    parser = argparse.ArgumentParser(prog="yada", description="Assistant bot for contacts and notes.")
+    parser.add_argument("--storage", choices=STORAGE_NAMES, default="file",
+                        help="where contacts and notes are kept: snapshot and text files or an SQLite database")
+    parser.add_argument("--lazy-notes", action="store_true",
+                        help="memory-map the notes file and read notes only when a command needs them")
+    parser.add_argument("--lazy-contacts", action="store_true",
+                        help="memory-map the contacts snapshot and decode contacts only when a command needs them")
+    parser.add_argument("--startup-report", action="store_true",
+                        help="print import and startup times to the standard error")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every command by phase and count index lookups; see them with 'stats'")
+    parser.add_argument("--batch", metavar="PATH",
+                        help="run the commands of a script file, or of the standard input with '-', one per line")
+    parser.add_argument("--commit-every", metavar="N", type=int, default=0,
+                        help="in batch mode, commit the changes after every N commands instead of only at the end")
+    parser.add_argument("--autosave-delay", metavar="SECONDS", type=float, default=AUTOSAVE_DELAY,
+                        help="at the prompt, save changes in the background once no command changed anything"
+                             " for this long; 0 saves after every command before the next prompt")
+    parser.add_argument("command", nargs=argparse.REMAINDER,
+                        help="run this one command and exit, e.g. 'yada add-note buy milk'")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    report = startup_report
+    report.mark("imports")
+    options = parse_arguments(argv)
+    if options.startup_report:
+        report.trace_imports()
+    profiler.enabled = options.profile
+    report.mark("parse arguments")
+    # Piped commands are a batch read from the standard input.
+    batch = options.batch or (None if options.command or sys.stdin.isatty() else "-")
+    commit_every = max(options.commit_every, 0) if batch else 1
+    session = Session(get_storage(options.storage, options.lazy_notes, options.lazy_contacts), report, commit_every)
+    report.mark("open storage")
+    try:
+        if options.command:
+            with report.measure("run command"):
+                run_command(session, " ".join(options.command))
+        elif batch:
+            with report.measure("run batch"):
+                run_batch(session, batch)
         else:
-            print(f"{Color.RED}Invalid command. Print 'Help' to see all commands.\n{Color.RESET}")
+            if options.autosave_delay > 0:
+                session.autosave = Autosave(session, options.autosave_delay)
+            for user_input in prompt_commands(session, options.startup_report):
+                if not run_command(session, user_input):
+                    break
+    finally:
+        close_session(session)
+    if options.startup_report and (options.command or batch):
+        report.print_report()
+    if options.profile:
+        show_stats()
+    report.stop_tracing()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,238 @@
+import os
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import date, datetime
+
+from yada.address_book import AddressBook, Color, Record
+from yada.indexes import birthday_periods, celebration_date, day_of_year
+from yada.journal import replay_journal
+from yada.profiling import profiler
+from yada.validation import normalize_phone
+
+# Number of unchanged records kept decoded in memory.
+RECORD_CACHE_SIZE = 1024
+
+
+class MappedRecords(MutableMapping):
+    """
+    Records mapping over a memory-mapped snapshot file.
+    Keeps only the offset of every record and decodes a record the first time it is read.
+    The last RECORD_CACHE_SIZE decoded records are cached; records changed since the snapshot
+    was written are kept until the next snapshot.
+    """
+
+    def __init__(self, path: str, book=None, cache_size: int = RECORD_CACHE_SIZE):
+        from yada import snapshot
+        self._book = book
+        self._reader = None
+        self._entries = {}
+        self._cache = OrderedDict()
+        self.cache_size = cache_size
+        if not os.path.exists(path):
+            print(f"{Color.RED}Contact book was not found. A new one was created.\n{Color.RESET}")
+            return
+        if snapshot.migrate(path):
+            print(f"{Color.YELLOW}{path} was converted to the snapshot format.\n{Color.RESET}")
+        self._open(path)
+
+    def _open(self, path):
+        from yada import snapshot
+        self._reader = snapshot.SnapshotReader(path)
+        names, offsets = self._reader.names_and_offsets()
+        self._entries = dict(zip(names, offsets))
+
+    def _decode(self, offset):
+        record = self._reader.read_record(offset)
+        record.book = self._book
+        return record
+
+    def __getitem__(self, name):
+        entry = self._entries[name]
+        if isinstance(entry, Record):
+            return entry
+        record = self._cache.get(name)
+        if record is not None:
+            self._cache.move_to_end(name)
+            return record
+        record = self._cache[name] = self._decode(entry)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return record
+
+    def __setitem__(self, name, record):
+        self._entries[name] = record
+        self._cache.pop(name, None)
+
+    def __delitem__(self, name):
+        del self._entries[name]
+        self._cache.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """
+        Streams all records. Records that are not in memory are decoded for the caller but not kept.
+        """
+        cache = self._cache
+        for name, entry in self._entries.items():
+            if isinstance(entry, Record):
+                yield name, entry
+            else:
+                record = cache.get(name)
+                yield name, record if record is not None else self._decode(entry)
+
+    def values(self):
+        for _, record in self.items():
+            yield record
+
+    def save(self, path: str):
+        """
+        Writes all records to a new snapshot. Unchanged records of the current version are copied as encoded bytes,
+        with the string table of the old snapshot kept as the start of the new one.
+        The file is replaced atomically and mapped again.
+        :param path:
+        :return None:
+        """
+        from yada import snapshot
+        reader = self._reader
+        strings = {value: i for i, value in enumerate(reader.strings)} if reader is not None else {}
+
+        # Records of an older snapshot version are encoded again instead of copied.
+        copy = reader is not None and reader.version == snapshot.SNAPSHOT_VERSION
+
+        def payloads():
+            for name, entry in self._entries.items():
+                if isinstance(entry, Record):
+                    yield name, snapshot.encode_record(entry, strings)
+                elif copy:
+                    yield name, reader.read_payload(entry)
+                else:
+                    yield name, snapshot.encode_record(reader.read_record(entry), strings)
+
+        snapshot.replace_file(path, lambda file: snapshot.dump_payloads(payloads(), strings, file))
+        # Closed only once the new file is in place, so a failed save leaves the book readable.
+        if reader is not None:
+            reader.close()
+        changed = [(name, entry) for name, entry in self._entries.items() if isinstance(entry, Record)]
+        self._open(path)
+        for name, record in changed[-self.cache_size:]:
+            self._cache[name] = record
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+            self._reader = None
+
+
+class LazyAddressBook(AddressBook):
+    """
+    Address book that memory-maps its snapshot and decodes a record only when a command needs it.
+    Startup reads just the names and offsets of the records, and memory holds only the records in use.
+    There are no lookup indexes in memory, so searches by phone, email, birthday or address
+    stream through the snapshot.
+    """
+
+    def __init__(self, path="data"):
+        super().__init__()
+        self.data = MappedRecords(path, self)
+
+    def __getstate__(self):
+        raise TypeError("Lazy address book is saved by save_snapshot")
+
+    def _index_record(self, record):
+        pass
+
+    def _unindex_record(self, record):
+        pass
+
+    def _mark_changed(self, name, record):
+        super()._mark_changed(name, record)
+        if record is not None:
+            # Keeps the changed record until the next snapshot, even if it was streamed or evicted.
+            self.data[name] = record
+
+    def save_snapshot(self, path: str):
+        self.data.save(path)
+
+    def snapshot_writer(self, path: str):
+        # The records are mapped from the new file as soon as it is written, so it can't wait.
+        self.data.save(path)
+        return lambda: None
+
+    def items(self):
+        return self.data.items()
+
+    def values(self):
+        return self.data.values()
+
+    def _scan(self, what: str):
+        profiler.count("scan", what, len(self.data))
+        return self.data.values()
+
+    def find_by_phone(self, phone: str):
+        key = normalize_phone(phone)
+        for record in self._scan("phones"):
+            if any(normalize_phone(known.value) == key for known in record.phones):
+                return record
+        return None
+
+    def find_by_email(self, email):
+        key = email.lower()
+        return [record for record in self._scan("emails")
+                if any(known.value.lower() == key for known in record.emails)]
+
+    def find_by_birthday(self, birthday: str):
+        try:
+            datetime.strptime(birthday, "%d.%m.%Y")
+        except ValueError:
+            return []
+        return [record for record in self._scan("birthdays") if str(record.birthday) == birthday]
+
+    def upcoming_birthdays(self, days: int, today: date = None):
+        periods = list(birthday_periods(today or datetime.today().date(), days))
+        found = []
+        for record in self._scan("birthdays"):
+            birthday = getattr(record.birthday, "birthday", None)
+            if birthday is None:
+                continue
+            day = day_of_year(birthday)
+            for year, first_day, last_day in periods:
+                if first_day <= day <= last_day:
+                    found.append((celebration_date(year, day), record))
+                    break
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def find_by_address(self, city=None, street=None, country=None, prefix=False):
+        return [record for record in self._scan("addresses")
+                if any(address.matches(country, city, street, prefix) for address in record.addresses)]
+
+    def count_by_address(self, city=None, street=None, country=None, prefix=False):
+        return len(self.find_by_address(city, street, country, prefix))
+
+    def count_by_city(self):
+        counts = {}
+        for record in self._scan("addresses"):
+            for city in {address.city.lower() for address in record.addresses}:
+                counts[city] = counts.get(city, 0) + 1
+        return counts
+
+
+def read_lazy_data(path="data") -> LazyAddressBook:
+    """
+    Opens the snapshot lazily and applies the changes journaled after it.
+    :param path:
+    :return LazyAddressBook:
+    """
+    contacts = LazyAddressBook(path)
+    replay_journal(contacts, path)
+    return contacts
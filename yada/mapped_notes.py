@@ -0,0 +1,138 @@
+import locale
+import mmap
+import os
+import re
+from collections.abc import MutableMapping
+
+from yada.address_book import Color
+from yada.notebook import NOTES_FILE_NAME, Note, Notebook, format_note, parse_note, read_next_id, write_next_id
+
+# notes.txt is written in text mode, so it uses the locale encoding.
+NOTES_ENCODING = locale.getpreferredencoding(False)
+
+# One stored note: a tags line followed by an "id:text" line.
+_RECORD_PATTERN = re.compile(rb"[^\n]*\n(\d+):[^\n]*(?:\n|\Z)")
+
+
+class MappedNotes(MutableMapping):
+    """
+    Notes mapping over a memory-mapped notes file.
+    Keeps only the byte range of every note and parses a note the first time it is read.
+    """
+
+    def __init__(self, path=NOTES_FILE_NAME, notebook=None):
+        self._notebook = notebook
+        self._map = None
+        self._entries = {}
+        self.max_id = 0
+        try:
+            file = open(path, "rb")
+        except FileNotFoundError:
+            print(f"{Color.RED}File with notes {path} doesn't exist! A new one was created{Color.RESET}\n")
+            return
+        with file:
+            if os.fstat(file.fileno()).st_size > 0:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map is not None:
+            for match in _RECORD_PATTERN.finditer(self._map):
+                note_id = int(match.group(1))
+                self._entries[note_id] = match.span()
+                self.max_id = max(self.max_id, note_id)
+
+    def _parse(self, span):
+        tags_line, note_line = self._map[span[0]:span[1]].decode(NOTES_ENCODING).split("\n")[:2]
+        note = parse_note(tags_line, note_line)
+        note.notebook = self._notebook
+        return note
+
+    def __getitem__(self, note_id):
+        entry = self._entries[note_id]
+        if isinstance(entry, Note):
+            return entry
+        note = self._entries[note_id] = self._parse(entry)
+        return note
+
+    def __setitem__(self, note_id, note):
+        self._entries[note_id] = note
+
+    def __delitem__(self, note_id):
+        del self._entries[note_id]
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def items(self):
+        """
+        Streams all notes. Notes that were not loaded yet are parsed for the caller but not kept.
+        """
+        for note_id, entry in self._entries.items():
+            yield note_id, entry if isinstance(entry, Note) else self._parse(entry)
+
+    def values(self):
+        for _, note in self.items():
+            yield note
+
+    def save(self, path=NOTES_FILE_NAME):
+        """
+        Writes all notes to the file. Notes that were never loaded are copied as raw bytes.
+        The file is replaced atomically and mapped again.
+        :param path:
+        :return None:
+        """
+        temp_path = path + ".tmp"
+        spans = {}
+        position = 0
+        try:
+            with open(temp_path, "wb") as file:
+                for note_id, entry in self._entries.items():
+                    if isinstance(entry, Note):
+                        chunk = format_note(entry).encode(NOTES_ENCODING)
+                    else:
+                        chunk = self._map[entry[0]:entry[1]]
+                        if not chunk.endswith(b"\n"):
+                            chunk += b"\n"
+                        spans[note_id] = (position, position + len(chunk))
+                    file.write(chunk)
+                    position += len(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        # Closed only once the new file is in place, so a failed save leaves the notes readable.
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._entries.update(spans)
+        if position > 0:
+            with open(path, "rb") as file:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class LazyNotebook(Notebook):
+    """
+    Notebook that memory-maps the notes file and builds Note objects only when a command needs them.
+    Building the search indexes on the first search streams the notes without keeping them.
+    """
+
+    def load_notes(self):
+        self.notes = MappedNotes(NOTES_FILE_NAME, self)
+        self._next_id = max(self.notes.max_id + 1, read_next_id())
+
+    def save_notes(self):
+        self.notes_writer()
+        self.pop_changes()
+
+    def notes_writer(self):
+        # The notes are mapped from the new file as soon as it is written, so it can't wait.
+        write_next_id(self._next_id)
+        self.notes.save(NOTES_FILE_NAME)
+        return lambda: None
+
+    def mark_changed(self, note_id, note=None):
+        if note is not None:
+            self.notes[note_id] = note
+        super().mark_changed(note_id, note)
@@ -1,280 +1,544 @@
-# models block
-from tabulate import tabulate
-from yada.address_book import Color
-from yada.exceptions import (AddNoteError, AddTagError,
-                             DeleteNoteError, DeleteTagError, EditNoteError, SearchNoteByTagError,
-                             SearchNoteByTextError, input_note_error)
-
-NOTES_FILE_NAME = "notes.txt"
-
-
-# Model Note
-class Note:
-    """
-    Class that represents note in notebook.
-    """
-
-    def __init__(self, text, note_id=None, tags=None):
-        self.text = text
-        self.id = note_id
-        self.tags = tags if tags else []
-
-    def add_tag(self, tag):
-        """
-        Adds a new tag to the note.
-        """
-        if tag not in self.tags:
-            self.tags.append(str(tag))
-
-    def delete_tag(self, tag_to_delete):
-        """
-        Deletes a selected tag from the note's tags.
-        """
-        initial_tag_length = len(self.tags)
-        self.tags = [tag for tag in self.tags if tag != tag_to_delete]
-        return initial_tag_length != len(self.tags)
-
-
-# Model Notebook
-class Notebook:
-    """
-    Class to manage and store notes in a notebook.
-    """
-
-    def __init__(self):
-        self.notes = []
-        self.load_notes()
-
-    def save_notes(self):
-        with open(NOTES_FILE_NAME, "w") as file:
-            for note in self.notes:
-                tags_str = ", ".join(note.tags)
-                file.write(f"{tags_str}\n{note.id}:{note.text}\n")
-
-    def load_notes(self):
-        try:
-            with open(NOTES_FILE_NAME, "r") as file:
-                self.notes = []
-                lines = file.readlines()
-                for i in range(0, len(lines), 2):
-                    tags_line = lines[i].strip()
-                    note_line = lines[i + 1].strip()
-
-                    tags = [tag.strip() for tag in tags_line.split(",") if tag.strip()]
-
-                    note_id, text = note_line.split(":", 1)
-                    self.notes.append(Note(text=text, note_id=int(note_id), tags=tags))
-        except FileNotFoundError:
-            print(f"{Color.RED}File with notes {NOTES_FILE_NAME} doesn't exist! A new one was created{Color.RESET}\n")
-
-    def find_note_by_id(self, note_id):
-        """
-        Finds a note by its ID.
-        :param note_id: ID of the note to find.
-        :return: Note object or None if not found.
-        """
-        for note in self.notes:
-            if int(note.id) == int(note_id):
-                return note
-        return None
-
-
-# functions block
-
-@input_note_error
-def add_note(notebook, args):
-    """
-    Adds a note to users notebook.
-    :param notebook:
-    :param args:
-    :return None:
-    """
-    try:
-        text = args[0]
-        new_id = max([note.id for note in notebook.notes], default=0) + 1
-        notebook.notes.append(Note(text, new_id))
-        print(f"{Color.GREEN}Note was added under the id:{new_id}.{Color.RESET}\n")
-        notebook.save_notes()
-    except (ValueError, IndexError):
-        raise AddNoteError
-
-
-@input_note_error
-def edit_note(notebook, args):
-    """
-    Edits a note in the users' notebook.
-    :param notebook:
-    :param args:
-    return None
-    """
-    try:
-        note_id = int(args[0])
-        new_text = args[1]
-        for note in notebook.notes:
-            if note.id == note_id:
-                note.text = str(new_text)
-                notebook.save_notes()
-                print(f"Note {note_id} was edited.\n")
-                return
-        print(f"Note with Id:{note_id} doesn't exist.\n")
-    except (ValueError, IndexError):
-        raise EditNoteError
-
-
-@input_note_error
-def search_notes_by_text(notebook, args):
-    """
-    Searches and prints notes in the notebook by a query.
-    :param notebook:
-    :param args:
-    return None
-    """
-    try:
-        data = []
-        count = 0
-        for note in notebook.notes:
-            if args[0].lower() in note.text.lower():
-                tags_str = ", ".join(note.tags)
-                data.append([note.id, str(tags_str), note.text])
-                count += 1
-        if count == 0:
-            print(f"{Color.RED}There are no notes matching specified criteria.{Color.RESET}\n")
-            return
-        headers = ["Id", "Tags", "Note Text"]
-        table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-        print(table)
-    except (ValueError, IndexError):
-        raise SearchNoteByTextError
-
-
-@input_note_error
-def search_notes_by_tag(notebook, args):
-    """
-    Searches and prints notes in the notebook by a query.
-    :param notebook:
-    :param args:
-    return None
-    """
-    try:
-        data = []
-        count = 0
-        for note in notebook.notes:
-            for tag in note.tags:
-                if str(tag.lower()) == args[0].lower():
-                    tags_str = ", ".join(note.tags)
-                    data.append([note.id, str(tags_str), note.text])
-                    count += 1
-        if count == 0:
-            print(f"{Color.RED}There are no notes matching specified criteria.{Color.RESET}\n")
-            return
-        headers = ["Id", "Tags", "Note Text"]
-        table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-        print(table)
-    except (ValueError, IndexError):
-        raise SearchNoteByTagError
-
-
-@input_note_error
-def delete_note(notebook, args):
-    """
-    Deletes note from user's notebook.
-    :param notebook:
-    :param args:
-    """
-    try:
-        note_id = int(args[0])
-        initial_length = len(notebook.notes)
-        notebook.notes = [note for note in notebook.notes if note.id != note_id]
-        if initial_length == len(notebook.notes):
-            print(f"There is no note with id {note_id}.\n")
-            return
-        else:
-            notebook.save_notes()
-            print(f"Note with Id:{note_id} was deleted.\n")
-    except (ValueError, IndexError):
-        raise DeleteNoteError
-
-
-@input_note_error
-def show_all_notes(notebook, args):
-    """
-    Displays all notes in the notebook.
-    :return None:
-    """
-    if not notebook.notes:
-        print(f"{Color.RED}There are no notes in the notebook.{Color.RESET}\n")
-        return
-    data = []
-    headers = ["Id", "Tags", "Note Text"]
-    for note in notebook.notes:
-        tags_str = ''
-        if len(note.tags) != 0:
-            tags_str = ", ".join(note.tags)
-        data.append([note.id, str(tags_str), note.text])
-    table = tabulate(data, headers=headers, tablefmt="fancy_grid")
-    print(table)
-
-
-@input_note_error
-def add_tag_to_note(notebook, args):
-    """
-    Adds a tag to a specific note.
-    :param notebook:
-    :param args:
-    """
-    try:
-        note_id = args[0]
-        tag = str(args[1])
-        note = notebook.find_note_by_id(note_id)
-        if note:
-            note.add_tag(tag)
-            notebook.save_notes()
-            print(f"{Color.GREEN}Tag '{tag}' added to note ID {note_id}.{Color.RESET}\n")
-        else:
-            print(f"{Color.RED}Note with ID {note_id} not found.{Color.RESET}\n")
-    except (ValueError, IndexError):
-        raise AddTagError
-
-
-@input_note_error
-def delete_tag(notebook, args):
-    """
-    Edits tags of a specific note.
-    :param notebook:
-    :param args:
-    """
-    try:
-        note_id = args[0]
-        tag = args[1]
-        note = notebook.find_note_by_id(note_id)
-        if note:
-            result = note.delete_tag(str(tag))
-            notebook.save_notes()
-            if result:
-                print(f"{Color.GREEN}Tag {str(tag)} of note ID {note_id} deleted.{Color.RESET}\n")
-            else:
-                print(f"{Color.RED}No tag {str(tag)} found in note ID {note_id}.{Color.RESET}\n")
-        else:
-            print(f"{Color.RED}Note with ID {note_id} not found.{Color.RESET}\n")
-    except (ValueError, IndexError):
-        raise DeleteTagError
-
-
-def sort_notes_by_tags(notebook, args):
-    """
-    Sorts notes by their tags and prints them.
-    """
-    if not notebook.notes:
-        print(f"{Color.RED}There are no notes in the notebook.{Color.RESET}\n")
-        return
-    sorted_by_tags = {}
-    for note in notebook.notes:
-        for tag in note.tags:
-            if tag not in sorted_by_tags:
-                sorted_by_tags[tag] = []
-            sorted_by_tags[tag].append(note)
-
-    for tag, notes in sorted_by_tags.items():
-        print(f"{Color.GREEN}Tag: {tag}{Color.RESET}")
-        for note in notes:
-            print(f" - ID: {note.id}, Text: {note.text}")
+# models block
+from yada.address_book import Color
+from yada.indexes import TagIndex, TextIndex
+from yada.profiling import profiler
+from yada.exceptions import (AddNoteError, AddTagError,
+                             DeleteNoteError, DeleteTagError, EditNoteError, SearchNoteByTagError,
+                             SearchNoteByTextError, ShowAllNotesError, input_note_error)
+from yada.render import parse_page_options, print_page, render_table, select_page
+
+NOTES_FILE_NAME = "notes.txt"
+# Keeps the next note id, so the id of a deleted note is not handed out again after a restart.
+NOTES_ID_FILE_NAME = "notes.id"
+NOTE_SORT_KEYS = ("id", "text", "tags")
+
+
+# Model Note
+class Note:
+    """
+    Class that represents note in notebook.
+    """
+
+    __slots__ = ("text", "id", "tags", "notebook")
+
+    def __init__(self, text, note_id=None, tags=None):
+        self.text = text
+        self.id = note_id
+        self.tags = tags if tags else []
+        self.notebook = None
+
+    def add_tag(self, tag):
+        """
+        Adds a new tag to the note and updates the tag index of its notebook.
+        :return True if the tag was not there before:
+        """
+        if tag in self.tags:
+            return False
+        self.tags.append(str(tag))
+        if self.notebook is not None:
+            self.notebook._tag_added(self, str(tag))
+        return True
+
+    def delete_tag(self, tag_to_delete):
+        """
+        Deletes a selected tag from the note's tags and updates the tag index of its notebook.
+        :return True if the tag was there:
+        """
+        if tag_to_delete not in self.tags:
+            return False
+        self.tags = [tag for tag in self.tags if tag != tag_to_delete]
+        if self.notebook is not None:
+            self.notebook._tag_deleted(self, tag_to_delete)
+        return True
+
+
+def format_note(note):
+    """
+    Formats a note as the two lines stored in the notes file: tags and "id:text".
+    :param note:
+    :return str:
+    """
+    tags_str = ", ".join(note.tags)
+    return f"{tags_str}\n{note.id}:{note.text}\n"
+
+
+def read_next_id(path=NOTES_ID_FILE_NAME):
+    """
+    Reads the stored next note id.
+    :param path:
+    :return int, 1 if nothing was stored yet:
+    """
+    try:
+        with open(path, "r") as file:
+            return int(file.read().strip())
+    except (FileNotFoundError, ValueError):
+        return 1
+
+
+def write_next_id(next_id, path=NOTES_ID_FILE_NAME):
+    """
+    Stores the next note id.
+    :param next_id:
+    :param path:
+    :return None:
+    """
+    with open(path, "w") as file:
+        file.write(f"{next_id}\n")
+
+
+def parse_note(tags_line, note_line):
+    """
+    Builds a note from the two lines stored in the notes file.
+    :param tags_line:
+    :param note_line:
+    :return Note:
+    """
+    tags = [tag.strip() for tag in tags_line.strip().split(",") if tag.strip()]
+    note_id, text = note_line.strip().split(":", 1)
+    return Note(text=text, note_id=int(note_id), tags=tags)
+
+
+# Model Notebook
+class Notebook:
+    """
+    Class to manage and store notes in a notebook.
+    Notes are kept in a dict by id, in the order they were added.
+    Remembers which notes changed since the last save, so unchanged notebooks are never rewritten.
+    The search indexes are built on the first search, so commands that don't search never pay for them.
+    """
+
+    def __init__(self):
+        self.notes = {}
+        self._next_id = 1
+        self._text_index = TextIndex()
+        self._tag_index = TagIndex()
+        self._indexed = False
+        self._changes = {}
+        self.generation = 0
+        self.load_notes()
+
+    def mark_changed(self, note_id, note=None):
+        """
+        Remembers that a note was added, edited or deleted.
+        :param note_id:
+        :param note: Note object, or None if the note was deleted.
+        :return None:
+        """
+        self._changes[note_id] = note
+        self.generation += 1
+
+    @property
+    def dirty(self):
+        """
+        Tells whether the notebook has changes that were not saved yet.
+        :return bool:
+        """
+        return bool(self._changes)
+
+    def pop_changes(self):
+        """
+        Returns the notes changed since the last call and forgets them.
+        :return dict id -> Note, or None for deleted notes:
+        """
+        changes, self._changes = self._changes, {}
+        return changes
+
+    def restore_changes(self, changes):
+        """
+        Puts back changes taken by pop_changes that could not be saved. Changes made since then win over them.
+        :param changes: dict id -> Note, or None for deleted notes.
+        :return None:
+        """
+        restored = dict(changes)
+        restored.update(self._changes)
+        self._changes = restored
+
+    def save_changes(self):
+        """
+        Saves notes only if something changed since the last save.
+        :return None:
+        """
+        if self._changes:
+            self.save_notes()
+
+    def save_notes(self):
+        self.notes_writer()()
+        self.pop_changes()
+
+    def notes_writer(self):
+        """
+        Formats all notes for the notes file, so it can be written later without the notebook.
+        :return function writing the file:
+        """
+        text = "".join(format_note(note) for note in self.notes.values())
+        next_id = self._next_id
+
+        def write():
+            write_next_id(next_id)
+            with open(NOTES_FILE_NAME, "w") as file:
+                file.write(text)
+
+        return write
+
+    def load_notes(self):
+        try:
+            with open(NOTES_FILE_NAME, "r") as file:
+                self.notes = {}
+                self._next_id = 1
+                self._text_index = TextIndex()
+                self._tag_index = TagIndex()
+                self._indexed = False
+                lines = file.readlines()
+                for i in range(0, len(lines), 2):
+                    self._insert(parse_note(lines[i], lines[i + 1]))
+        except FileNotFoundError:
+            print(f"{Color.RED}File with notes {NOTES_FILE_NAME} doesn't exist! A new one was created{Color.RESET}\n")
+        self._next_id = max(self._next_id, read_next_id())
+
+    def _insert(self, note):
+        self.notes[note.id] = note
+        self._next_id = max(self._next_id, note.id + 1)
+        self._index_note(note)
+        note.notebook = self
+
+    def _ensure_indexes(self):
+        """
+        Builds the search indexes from all notes, once.
+        :return None:
+        """
+        if self._indexed:
+            return
+        self._indexed = True
+        for note in self.notes.values():
+            self._index_note(note)
+
+    def _index_note(self, note):
+        """
+        Adds the note text and tags to the search indexes, replacing its previous text.
+        Does nothing until the indexes are built.
+        :param note:
+        :return None:
+        """
+        if not self._indexed:
+            return
+        self._text_index.add(note.id, note.text)
+        for tag in note.tags:
+            self._tag_index.add(tag, note.id)
+
+    def _unindex_note(self, note):
+        """
+        Removes the note from the search indexes.
+        :param note:
+        :return None:
+        """
+        if not self._indexed:
+            return
+        self._text_index.discard(note.id)
+        for tag in note.tags:
+            self._tag_index.discard(tag, note.id)
+
+    def _tag_added(self, note, tag):
+        if self._indexed:
+            self._tag_index.add(tag, note.id)
+        self.mark_changed(note.id, note)
+
+    def _tag_deleted(self, note, tag):
+        folded = tag.casefold()
+        if self._indexed and all(other.casefold() != folded for other in note.tags):
+            self._tag_index.discard(tag, note.id)
+        self.mark_changed(note.id, note)
+
+    def add(self, text):
+        """
+        Adds a new note with the next free id.
+        :param text:
+        :return: the new Note object.
+        """
+        new_id = self._next_id
+        new_note = Note(text, new_id)
+        self._insert(new_note)
+        self.mark_changed(new_id, new_note)
+        return new_note
+
+    def edit(self, note_id, text):
+        """
+        Replaces the text of a note.
+        :param note_id:
+        :param text:
+        :return: True if the note exists.
+        """
+        note = self.notes.get(note_id)
+        if note is None:
+            return False
+        note.text = str(text)
+        self._index_note(note)
+        self.mark_changed(note_id, note)
+        return True
+
+    def delete(self, note_id):
+        """
+        Deletes a note.
+        :param note_id:
+        :return: True if the note existed.
+        """
+        deleted_note = self.notes.pop(note_id, None)
+        if deleted_note is None:
+            return False
+        self._unindex_note(deleted_note)
+        deleted_note.notebook = None
+        self.mark_changed(note_id)
+        return True
+
+    def search_text(self, query):
+        """
+        Finds notes whose text contains the query, ignoring case.
+        :param query:
+        :return: list of Note objects ordered by id.
+        """
+        self._ensure_indexes()
+        return [self.notes[note_id] for note_id in sorted(self._text_index.search(query))]
+
+    def search_tags(self, tags, match_any=False):
+        """
+        Finds notes by tags, ignoring case.
+        :param tags:
+        :param match_any: Return notes with any of the tags instead of all of them.
+        :return: list of Note objects ordered by id.
+        """
+        self._ensure_indexes()
+        profiler.count("index", "tags")
+        found = self._tag_index.find_any(tags) if match_any else self._tag_index.find_all(tags)
+        return [self.notes[note_id] for note_id in sorted(found)]
+
+    def complete_tags(self, prefix, limit):
+        """
+        Finds tags starting with the prefix, ignoring case.
+        :param prefix:
+        :param limit: largest number of tags to return.
+        :return: list of case-folded tags in alphabetical order.
+        """
+        self._ensure_indexes()
+        return self._tag_index.complete(prefix, limit)
+
+    def tag_counts(self):
+        """
+        Returns the number of notes for every tag.
+        :return: dict tag -> count, sorted by tag.
+        """
+        self._ensure_indexes()
+        profiler.count("index", "tags")
+        return self._tag_index.counts()
+
+    def notes_by_tags(self):
+        """
+        Groups notes by their tags.
+        :return: list of (tag, list of Note objects) pairs sorted by tag.
+        """
+        self._ensure_indexes()
+        return [(tag, [self.notes[note_id] for note_id in sorted(self._tag_index.get(tag))])
+                for tag in self._tag_index]
+
+    def find_note_by_id(self, note_id):
+        """
+        Finds a note by its ID.
+        :param note_id: ID of the note to find.
+        :return: Note object or None if not found.
+        """
+        return self.notes.get(int(note_id))
+
+
+# functions block
+
+@input_note_error
+def add_note(notebook, args):
+    """
+    Adds a note to users notebook.
+    :param notebook:
+    :param args:
+    :return None:
+    """
+    try:
+        text = args[0]
+        new_note = notebook.add(text)
+        print(f"{Color.GREEN}Note was added under the id:{new_note.id}.{Color.RESET}\n")
+    except (ValueError, IndexError):
+        raise AddNoteError
+
+
+@input_note_error
+def edit_note(notebook, args):
+    """
+    Edits a note in the users' notebook.
+    :param notebook:
+    :param args:
+    return None
+    """
+    try:
+        note_id = int(args[0])
+        new_text = args[1]
+        if notebook.edit(note_id, new_text):
+            print(f"Note {note_id} was edited.\n")
+            return
+        print(f"Note with Id:{note_id} doesn't exist.\n")
+    except (ValueError, IndexError):
+        raise EditNoteError
+
+
+@input_note_error
+def search_notes_by_text(notebook, args):
+    """
+    Searches and prints notes in the notebook by a query.
+    :param notebook:
+    :param args:
+    return None
+    """
+    try:
+        data = []
+        count = 0
+        for note in notebook.search_text(args[0]):
+            tags_str = ", ".join(note.tags)
+            data.append([note.id, str(tags_str), note.text])
+            count += 1
+        if count == 0:
+            print(f"{Color.RED}There are no notes matching specified criteria.{Color.RESET}\n")
+            return
+        headers = ["Id", "Tags", "Note Text"]
+        table = render_table(headers, data)
+        print(table)
+    except (ValueError, IndexError):
+        raise SearchNoteByTextError
+
+
+@input_note_error
+def search_notes_by_tag(notebook, args):
+    """
+    Searches and prints notes that have all the given tags, or any of them with "--any".
+    :param notebook:
+    :param args:
+    return None
+    """
+    try:
+        match_any = "--any" in args
+        tags = [arg for arg in args if arg != "--any"]
+        if not tags:
+            raise IndexError
+        data = []
+        for note in notebook.search_tags(tags, match_any):
+            tags_str = ", ".join(note.tags)
+            data.append([note.id, str(tags_str), note.text])
+        if not data:
+            print(f"{Color.RED}There are no notes matching specified criteria.{Color.RESET}\n")
+            return
+        headers = ["Id", "Tags", "Note Text"]
+        table = render_table(headers, data)
+        print(table)
+    except (ValueError, IndexError):
+        raise SearchNoteByTagError
+
+
+@input_note_error
+def delete_note(notebook, args):
+    """
+    Deletes note from user's notebook.
+    :param notebook:
+    :param args:
+    """
+    try:
+        note_id = int(args[0])
+        if not notebook.delete(note_id):
+            print(f"There is no note with id {note_id}.\n")
+            return
+        else:
+            print(f"Note with Id:{note_id} was deleted.\n")
+    except (ValueError, IndexError):
+        raise DeleteNoteError
+
+
+@input_note_error
+def show_all_notes(notebook, args):
+    """
+    Displays one page of notes in the notebook. Only the notes on the page are loaded and formatted.
+    :param notebook:
+    :param args: optional --page N, --limit N, --sort id|text|tags and --reverse.
+    :return None:
+    """
+    try:
+        options = parse_page_options(args, NOTE_SORT_KEYS)
+    except ValueError:
+        raise ShowAllNotesError
+    total = len(notebook.notes)
+    if total == 0:
+        print(f"{Color.RED}There are no notes in the notebook.{Color.RESET}\n")
+        return
+    if options.sort == "text":
+        notes = select_page(notebook.notes.values(), options, lambda note: note.text.casefold())
+    elif options.sort == "tags":
+        notes = select_page(notebook.notes.values(), options,
+                            lambda note: sorted(tag.casefold() for tag in note.tags) or None)
+    else:
+        note_ids = select_page(iter(notebook.notes), options, int if options.sort == "id" else None)
+        notes = [notebook.notes[note_id] for note_id in note_ids]
+    data = []
+    headers = ["Id", "Tags", "Note Text"]
+    for note in notes:
+        tags_str = ''
+        if len(note.tags) != 0:
+            tags_str = ", ".join(note.tags)
+        data.append([note.id, str(tags_str), note.text])
+    print_page(headers, data, options, total, "notes", NOTE_SORT_KEYS)
+
+
+@input_note_error
+def add_tag_to_note(notebook, args):
+    """
+    Adds a tag to a specific note.
+    :param notebook:
+    :param args:
+    """
+    try:
+        note_id = args[0]
+        tag = str(args[1])
+        note = notebook.find_note_by_id(note_id)
+        if note:
+            note.add_tag(tag)
+            print(f"{Color.GREEN}Tag '{tag}' added to note ID {note_id}.{Color.RESET}\n")
+        else:
+            print(f"{Color.RED}Note with ID {note_id} not found.{Color.RESET}\n")
+    except (ValueError, IndexError):
+        raise AddTagError
+
+
+@input_note_error
+def delete_tag(notebook, args):
+    """
+    Edits tags of a specific note.
+    :param notebook:
+    :param args:
+    """
+    try:
+        note_id = args[0]
+        tag = args[1]
+        note = notebook.find_note_by_id(note_id)
+        if note:
+            result = note.delete_tag(str(tag))
+            if result:
+                print(f"{Color.GREEN}Tag {str(tag)} of note ID {note_id} deleted.{Color.RESET}\n")
+            else:
+                print(f"{Color.RED}No tag {str(tag)} found in note ID {note_id}.{Color.RESET}\n")
+        else:
+            print(f"{Color.RED}Note with ID {note_id} not found.{Color.RESET}\n")
+    except (ValueError, IndexError):
+        raise DeleteTagError
+
+
+def sort_notes_by_tags(notebook, args):
+    """
+    Sorts notes by their tags and prints them with the number of notes per tag.
+    """
+    if not notebook.notes:
+        print(f"{Color.RED}There are no notes in the notebook.{Color.RESET}\n")
+        return
+    for tag, notes in notebook.notes_by_tags():
+        print(f"{Color.GREEN}Tag: {tag} ({len(notes)}){Color.RESET}")
+        for note in notes:
+            print(f" - ID: {note.id}, Text: {note.text}")
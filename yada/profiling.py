@@ -0,0 +1,165 @@
+import time
+from contextlib import contextmanager
+
+# Parts of a command that are timed separately. "handler" is the time left after the other phases.
+PHASES = ("parse", "load", "handler", "render", "commit")
+
+
+class CommandTiming:
+    """
+    Accumulated wall time of one command name, split into phases.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the command loop.
+    Times every command and its phases, and counts lookups answered by an index against full scans.
+    Every method returns at once while the profiler is disabled.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.commands = {}
+        self.lookups = {}
+        self._current = None
+        self._nested = []
+
+    def reset(self):
+        self.commands = {}
+        self.lookups = {}
+
+    @contextmanager
+    def command(self, name: str):
+        """
+        Times one command. Phases entered inside the block are charged to it.
+        :param name:
+        :return None:
+        """
+        if not self.enabled or self._current is not None:
+            yield
+            return
+        self._current = phases = dict.fromkeys(PHASES, 0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._current = None
+            timing = self.commands.get(name)
+            if timing is None:
+                timing = self.commands[name] = CommandTiming()
+            timing.calls += 1
+            timing.total += elapsed
+            timing.max = max(timing.max, elapsed)
+            phases["handler"] += elapsed - sum(phases.values())
+            for phase, seconds in phases.items():
+                timing.phases[phase] += seconds
+
+    @contextmanager
+    def phase(self, name: str):
+        """
+        Times a phase of the current command. Time spent in nested phases is charged to them only.
+        :param name: one of PHASES.
+        :return None:
+        """
+        if self._current is None:
+            yield
+            return
+        self._nested.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            if self._current is not None:
+                self._current[name] += elapsed - nested
+
+    def count(self, kind: str, name: str, items: int = 1):
+        """
+        Counts one lookup.
+        :param kind: "index" for lookups answered by an index, "scan" for ones that walk over all items.
+        :param name: what was looked up, e.g. "phones".
+        :param items: number of entries the lookup went through.
+        :return None:
+        """
+        if not self.enabled:
+            return
+        entry = self.lookups.get((kind, name))
+        if entry is None:
+            self.lookups[(kind, name)] = [1, items]
+        else:
+            entry[0] += 1
+            entry[1] += items
+
+    def command_rows(self) -> list:
+        """
+        :return one row per command: name, calls, total, mean and max ms, then the mean ms of every phase:
+        """
+        rows = []
+        for name, timing in sorted(self.commands.items(), key=lambda item: -item[1].total):
+            rows.append([name, timing.calls, round(timing.total * 1e3, 2), round(timing.total / timing.calls * 1e3, 2),
+                         round(timing.max * 1e3, 2)]
+                        + [round(timing.phases[phase] / timing.calls * 1e3, 2) for phase in PHASES])
+        return rows
+
+    def lookup_rows(self) -> list:
+        """
+        :return one row per kind of lookup: kind, name, calls and entries visited:
+        """
+        return [[kind, name, calls, items] for (kind, name), (calls, items) in sorted(self.lookups.items())]
+
+
+profiler = Profiler()
+
+
+def run_with_cprofile(func, path: str, limit: int = 20):
+    """
+    Runs func under cProfile, saves the statistics for pstats or snakeviz and prints the slowest functions.
+    :param func:
+    :param path: file for the statistics.
+    :param limit: number of functions to print.
+    :return None:
+    """
+    import cProfile
+    import pstats
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        func()
+    finally:
+        profile.disable()
+        profile.dump_stats(path)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(limit)
+
+
+def run_with_tracemalloc(func, path: str, limit: int = 10):
+    """
+    Runs func while tracing memory allocations, saves the snapshot and prints the lines that allocated most.
+    The snapshot can be loaded again with tracemalloc.Snapshot.load.
+    :param func:
+    :param path: file for the snapshot.
+    :param limit: number of lines to print.
+    :return None:
+    """
+    import tracemalloc
+    tracemalloc.start(25)
+    try:
+        func()
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    snapshot.dump(path)
+    print(f"Peak traced memory: {peak / 1024:.1f} KiB")
+    for statistic in snapshot.statistics("lineno")[:limit]:
+        print(statistic)
@@ -0,0 +1,134 @@
+import heapq
+from itertools import count, islice
+
+from yada.address_book import Color
+from yada.profiling import profiler
+
+# Rows shown on one page when no --limit is given.
+PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 1000
+
+
+class PageOptions:
+    """
+    Which part of a long listing to show and in what order.
+    """
+
+    def __init__(self, page=1, limit=PAGE_LIMIT, sort=None, reverse=False):
+        self.page = page
+        self.limit = limit
+        self.sort = sort
+        self.reverse = reverse
+
+
+def parse_page_options(args: list, sort_keys) -> PageOptions:
+    """
+    Reads "--page N", "--limit N", "--sort <key>" and "--reverse" from the command arguments.
+    :param args:
+    :param sort_keys: names accepted by --sort.
+    :return PageOptions: Raises "ValueError" if the arguments are wrong.
+    """
+    options = PageOptions()
+    args = iter(args)
+    for arg in args:
+        if arg == "--reverse":
+            options.reverse = True
+        elif arg in ("--page", "--limit", "--sort"):
+            value = next(args, None)
+            if value is None:
+                raise ValueError(f"{arg} needs a value")
+            if arg == "--sort":
+                if value not in sort_keys:
+                    raise ValueError(f"unknown sort key {value}")
+                options.sort = value
+            elif not value.isdigit() or int(value) < 1:
+                raise ValueError(f"{arg} must be a positive number")
+            elif arg == "--page":
+                options.page = int(value)
+            else:
+                options.limit = min(int(value), MAX_PAGE_LIMIT)
+        else:
+            raise ValueError(f"unknown option {arg}")
+    return options
+
+
+def page_count(total: int, limit: int) -> int:
+    return max(1, -(-total // limit))
+
+
+def _missing_last_rank(key, reverse: bool):
+    """
+    Wraps a sort key so that items without a value rank after the others.
+    The rank is not flipped by reverse, so in both directions those items stay at the end.
+    :param key: sort key function that returns None for items without a value.
+    :param reverse:
+    :return sort key function:
+    """
+    known, missing = (1, 0) if reverse else (0, 1)
+
+    def rank(item):
+        value = key(item)
+        return (missing, None) if value is None else (known, value)
+
+    return rank
+
+
+def select_page(items, options: PageOptions, key=None) -> list:
+    """
+    Picks the items of the requested page without sorting or keeping all of them.
+    Only page * limit items are held at once.
+    :param items: iterable in its natural order.
+    :param options:
+    :param key: sort key function, None keeps the natural order.
+        Items whose key is None have no value to sort by and come last in either direction.
+    :return list of the items on the page:
+    """
+    end = options.page * options.limit
+    if key is None and not options.reverse:
+        chosen = list(islice(items, end))
+        profiler.count("scan", "page", len(chosen))
+    else:
+        pick = heapq.nlargest if options.reverse else heapq.nsmallest
+        positions = count()
+        if key is None:
+            decorated = ((position, position, item) for position, item in zip(positions, items))
+        else:
+            rank = _missing_last_rank(key, options.reverse)
+            decorated = ((rank(item), position, item) for position, item in zip(positions, items))
+        chosen = [item for _, _, item in pick(end, decorated)]
+        # zip draws one more position before it finds the items exhausted.
+        profiler.count("scan", "sorted page", next(positions) - 1)
+    return chosen[end - options.limit:]
+
+
+def render_table(headers: list, rows: list) -> str:
+    """
+    Lays out one page of rows. The column widths come from these rows only.
+    tabulate is imported on the first table, not at startup.
+    :param headers:
+    :param rows:
+    :return table as str:
+    """
+    with profiler.phase("render"):
+        from tabulate import tabulate
+        return tabulate(rows, headers=headers, tablefmt="fancy_grid")
+
+
+def print_page(headers: list, rows: list, options: PageOptions, total: int, what: str, sort_keys):
+    """
+    Prints one page of a listing with a footer telling how to see the rest.
+    :param headers:
+    :param rows: the rows of this page.
+    :param options:
+    :param total: number of items in the whole listing.
+    :param what: name of the listed items, e.g. "contacts".
+    :param sort_keys: names accepted by --sort, shown in the footer.
+    :return None:
+    """
+    pages = page_count(total, options.limit)
+    if not rows:
+        print(f"{Color.RED}Page {options.page} doesn't exist, there are {pages} pages of {what}.\n{Color.RESET}")
+        return
+    print(render_table(headers, rows))
+    print(f"{Color.CYAN}Page {options.page} of {pages}, {total} {what}.{Color.RESET}"
+          f" Use --page N, --limit N, --sort {'|'.join(sort_keys)}, --reverse.\n")
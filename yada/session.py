@@ -0,0 +1,114 @@
+import threading
+
+from yada.profiling import profiler
+from yada.storage import Storage
+from yada.startup import StartupReport
+
+
+class Session:
+    """
+    Contacts and notes of one run of the assistant.
+    Each of them is loaded from the storage when a command first needs it,
+    so a run that only touches notes never reads the contacts and the other way round.
+    Changes are committed after every commit_every commands, or only by an explicit commit when it is 0.
+    With autosave set, they are committed in the background instead; commands hold the lock while they run,
+    and autosave holds it only to take the changes, not to write them.
+    """
+
+    def __init__(self, storage: Storage, report: StartupReport = None, commit_every: int = 1):
+        self.storage = storage
+        self.report = report or StartupReport()
+        self.commit_every = commit_every
+        self._contacts = None
+        self._notebook = None
+        self._uncommitted = 0
+        self.autosave = None
+        self.lock = threading.RLock()
+
+    @property
+    def contacts(self):
+        if self._contacts is None:
+            with self.report.measure("load contacts"), profiler.phase("load"):
+                self._contacts = self.storage.load_contacts()
+        return self._contacts
+
+    @property
+    def notebook(self):
+        if self._notebook is None:
+            with self.report.measure("load notes"), profiler.phase("load"):
+                self._notebook = self.storage.load_notes()
+        return self._notebook
+
+    @property
+    def contacts_loaded(self):
+        return self._contacts is not None
+
+    @property
+    def notebook_loaded(self):
+        return self._notebook is not None
+
+    def commit_contacts(self):
+        if self._contacts is not None:
+            with profiler.phase("commit"):
+                self.storage.commit_contacts(self._contacts)
+
+    def commit_notes(self):
+        if self._notebook is not None:
+            with profiler.phase("commit"):
+                self.storage.commit_notes(self._notebook)
+
+    def command_done(self):
+        """
+        Counts a command that may have changed contacts or notes and commits once commit_every of them ran.
+        :return None:
+        """
+        self._uncommitted += 1
+        if self.autosave is not None:
+            self.autosave.schedule()
+        elif self.commit_every and self._uncommitted >= self.commit_every:
+            self.commit()
+
+    def commit(self):
+        """
+        Persists the changes of everything that was loaded.
+        :return None:
+        """
+        self.commit_contacts()
+        self.commit_notes()
+        self._uncommitted = 0
+
+    def prepare_commit(self):
+        """
+        Takes the changes of everything that was loaded, for writing after the lock is released.
+        Backends that can't write apart from the data commit right away. Called holding the lock.
+        :return list of PendingWrite:
+        """
+        pending = []
+        with profiler.phase("commit"):
+            if self._contacts is not None:
+                pending.append(self.storage.prepare_contacts(self._contacts))
+            if self._notebook is not None:
+                pending.append(self.storage.prepare_notes(self._notebook))
+        self._uncommitted = 0
+        return [write for write in pending if write is not None]
+
+    def write_pending(self, pending):
+        """
+        Runs writes made by prepare_commit without holding the lock.
+        The changes of a failed write are put back, so the next commit writes them again.
+        :param pending:
+        :return None, or raises the first error once every write was tried:
+        """
+        error = None
+        for write in pending:
+            try:
+                write.write()
+            except Exception as failure:
+                with self.lock:
+                    write.undo()
+                error = error or failure
+        if error is not None:
+            raise error
+
+    def close(self):
+        self.storage.close()
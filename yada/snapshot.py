@@ -0,0 +1,410 @@
+"""
+Binary snapshot format of the address book.
+
+    header   magic "YADA", format version and flags                      "<4sHH"
+    records  one block per record: payload length and payload             "<I" + payload
+    strings  interned address parts: count, lengths in characters, UTF-8 text
+    index    record names and the offsets of their blocks: offsets, lengths in characters, UTF-8 text
+    trailer  offsets of the strings and the index, record count, magic   "<QQI4s"
+
+A record payload holds the number of phones, emails and addresses and the birthday as a date ordinal,
+then the lengths of its own strings and the string table ids of its address parts, then the text of
+its own strings: name, phones, emails and the birthday as it was entered.
+Counts and lengths take 32 bits since version 2; version 1 stored them in 16 bits and is still read.
+Lengths are counted in characters, so the text of a record is decoded at once and then sliced.
+Records do not depend on the layout of the model classes, and the index lets a reader find
+a single record without decoding the others.
+"""
+import io
+import mmap
+import os
+import struct
+import sys
+from array import array
+from datetime import date
+from functools import lru_cache
+
+from yada.address_book import Address, AddressBook, Birthday, Email, Name, Phone, Record
+
+SNAPSHOT_MAGIC = b"YADA"
+SNAPSHOT_VERSION = 2
+
+_HEADER = struct.Struct("<4sHH")
+_TRAILER = struct.Struct("<QQI4s")
+_LENGTH = struct.Struct("<I")
+# Record heads by snapshot version. Version 1 stored counts and lengths in 16 bits.
+_RECORD_HEADS = {1: struct.Struct("<HHHi"), 2: struct.Struct("<IIIi")}
+_RECORD_HEAD = _RECORD_HEADS[SNAPSHOT_VERSION]
+# Lengths of strings and record parts are stored in 32 bits.
+MAX_LENGTH = 0xFFFFFFFF
+# Written blocks are collected up to this size before they go to the file.
+_WRITE_CHUNK = 1024 * 1024
+
+
+class SnapshotError(ValueError):
+    """
+    Raised when a file is not a snapshot of a supported version, or is damaged.
+    """
+
+
+@lru_cache(maxsize=None)
+def _record_body(strings: int, addresses: int, version: int = SNAPSHOT_VERSION) -> struct.Struct:
+    return struct.Struct(f"<{strings}{'H' if version == 1 else 'I'}{addresses * 4}I")
+
+
+def _check_length(value: str, what: str):
+    if len(value) > MAX_LENGTH:
+        raise SnapshotError(f"{what} is longer than {MAX_LENGTH} characters and can't be saved")
+
+
+def encode_record(record: Record, strings: dict) -> bytes:
+    """
+    Encodes a record as a snapshot payload.
+    :param record:
+    :param strings: string table, dict string -> id, extended with new address parts.
+    :return payload bytes:
+    """
+    birthday = getattr(record.birthday, "birthday", None)
+    texts = [record.name.value]
+    texts.extend(phone.value for phone in record.phones)
+    texts.extend(email.value for email in record.emails)
+    if birthday is not None:
+        texts.append(record.birthday.value)
+    ids = []
+    for address in record.addresses:
+        for part in (address.country, address.city, address.street, address.house_number):
+            string_id = strings.get(part)
+            if string_id is None:
+                _check_length(part, "Address part")
+                string_id = strings[part] = len(strings)
+            ids.append(string_id)
+    for text in texts:
+        _check_length(text, f"A field of '{record.name.value}'")
+    counts = (len(record.phones), len(record.emails), len(record.addresses))
+    if max(counts) > MAX_LENGTH:
+        raise SnapshotError(f"'{record.name.value}' has too many phones, emails or addresses to be saved")
+    return (_RECORD_HEAD.pack(*counts, birthday.toordinal() if birthday is not None else 0)
+            + _record_body(len(texts), len(record.addresses)).pack(*map(len, texts), *ids)
+            + "".join(texts).encode("utf-8"))
+
+
+def decode_record(payload, strings: list, version: int = SNAPSHOT_VERSION) -> Record:
+    """
+    Builds a record from a snapshot payload without validating its fields again.
+    :param payload: bytes, or a memoryview of them.
+    :param strings: string table as a list.
+    :param version: snapshot version the payload was written with.
+    :return Record:
+    """
+    head = _RECORD_HEADS[version]
+    phones, emails, addresses, birthday = head.unpack_from(payload)
+    count = 1 + phones + emails + (birthday != 0)
+    body = _record_body(count, addresses, version)
+    fields = body.unpack_from(payload, head.size)
+    values = _split(str(payload[head.size + body.size:], "utf-8"), fields[:count])
+
+    new = object.__new__
+    record = new(Record)
+    field = record.name = new(Name)
+    field.value = values[0]
+    record.phones = []
+    for value in values[1:1 + phones]:
+        field = new(Phone)
+        field.value = value
+        record.phones.append(field)
+    record.emails = []
+    for value in values[1 + phones:1 + phones + emails]:
+        field = new(Email)
+        field.value = value
+        record.emails.append(field)
+    if birthday:
+        field = record.birthday = new(Birthday)
+        field.value = values[-1]
+        field.birthday = date.fromordinal(birthday)
+    else:
+        record.birthday = "Unknown"
+    record.addresses = []
+    ids = fields[count:]
+    for i in range(0, len(ids), 4):
+        address = new(Address)
+        address.country, address.city, address.street, address.house_number = (
+            strings[ids[i]], strings[ids[i + 1]], strings[ids[i + 2]], strings[ids[i + 3]])
+        record.addresses.append(address)
+    record.book = None
+    return record
+
+
+def _encode_strings(values: list) -> bytes:
+    lengths = array("I", map(len, values))
+    return _LENGTH.pack(len(values)) + lengths.tobytes() + "".join(values).encode("utf-8")
+
+
+def _read_lengths(buffer, offset: int, count: int = None):
+    """
+    Reads the lengths of a list of strings, which are followed by the UTF-8 text of the strings.
+    :param buffer:
+    :param offset: where the lengths start, or the count in front of them when count is None.
+    :param count: number of strings when it is stored elsewhere.
+    :return array of lengths and the offset of the text:
+    """
+    if count is None:
+        count, = _LENGTH.unpack_from(buffer, offset)
+        offset += _LENGTH.size
+    lengths = array("I")
+    lengths.frombytes(buffer[offset:offset + count * lengths.itemsize])
+    offset += count * lengths.itemsize
+    return lengths, offset
+
+
+def _split(text: str, lengths) -> list:
+    values = []
+    start = 0
+    for length in lengths:
+        values.append(text[start:start + length])
+        start += length
+    return values
+
+
+def dump(contacts: AddressBook, file):
+    """
+    Writes the address book to a binary file in the snapshot format.
+    :param contacts:
+    :param file: file opened for binary writing.
+    :return None:
+    """
+    strings = {}
+    dump_payloads(((name, encode_record(record, strings)) for name, record in contacts.items()), strings, file)
+
+
+def dump_payloads(payloads, strings: dict, file):
+    """
+    Writes already encoded records to a binary file in the snapshot format.
+    :param payloads: iterable of (name, payload) pairs. The string table is written after it is consumed,
+    so the payloads may be encoded while they are written.
+    :param strings: string table the payloads refer to, dict string -> id.
+    :param file: file opened for binary writing.
+    :return None:
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("Snapshots are written on little-endian machines only")
+    names = []
+    offsets = array("Q")
+    chunk = bytearray(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0))
+    position = 0
+    for name, payload in payloads:
+        _check_length(name, "Contact name")
+        names.append(name)
+        offsets.append(position + len(chunk))
+        chunk += _LENGTH.pack(len(payload))
+        chunk += payload
+        if len(chunk) >= _WRITE_CHUNK:
+            file.write(chunk)
+            position += len(chunk)
+            chunk = bytearray()
+    strings_offset = position + len(chunk)
+    chunk += _encode_strings(list(strings))
+    index_offset = position + len(chunk)
+    chunk += offsets.tobytes()
+    chunk += array("I", map(len, names)).tobytes()
+    chunk += "".join(names).encode("utf-8")
+    chunk += _TRAILER.pack(strings_offset, index_offset, len(names), SNAPSHOT_MAGIC)
+    file.write(chunk)
+
+
+class SnapshotReader:
+    """
+    Memory-maps a snapshot file and decodes its parts on request.
+    The string table is read when the reader opens, records only when they are asked for.
+    """
+
+    def __init__(self, path: str):
+        if sys.byteorder != "little":
+            raise SnapshotError("Snapshots are read on little-endian machines only")
+        with open(path, "rb") as file:
+            try:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError(f"{path} is empty")
+        try:
+            self._open(path)
+        except (struct.error, UnicodeDecodeError, IndexError):
+            self.close()
+            raise SnapshotError(f"{path} is damaged")
+        except SnapshotError:
+            self.close()
+            raise
+
+    def _open(self, path):
+        magic, version, _ = _HEADER.unpack_from(self._map)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is not a YADA snapshot")
+        self.version = version
+        if version not in _RECORD_HEADS:
+            raise SnapshotError(f"{path} has snapshot version {version}, this YADA reads up to {SNAPSHOT_VERSION}")
+        self.strings_offset, self.index_offset, self.count, magic = _TRAILER.unpack_from(
+            self._map, len(self._map) - _TRAILER.size)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"{path} is damaged: the end of the file is missing")
+        lengths, text_offset = _read_lengths(self._map, self.strings_offset)
+        text = str(self._map[text_offset:self.index_offset], "utf-8")
+        self.strings = _split(text, lengths)
+
+    def names_and_offsets(self):
+        """
+        Reads the index of the snapshot.
+        :return list of record names and array of the offsets of their blocks:
+        """
+        offsets = array("Q")
+        offsets.frombytes(self._map[self.index_offset:self.index_offset + self.count * offsets.itemsize])
+        lengths, text_offset = _read_lengths(self._map, self.index_offset + self.count * offsets.itemsize,
+                                               self.count)
+        text = str(self._map[text_offset:len(self._map) - _TRAILER.size], "utf-8")
+        return _split(text, lengths), offsets
+
+    def read_payload(self, offset: int) -> bytes:
+        """
+        Returns the encoded record whose block starts at the offset.
+        :param offset:
+        :return payload bytes:
+        """
+        length, = _LENGTH.unpack_from(self._map, offset)
+        start = offset + _LENGTH.size
+        return self._map[start:start + length]
+
+    def read_record(self, offset: int) -> Record:
+        """
+        Decodes the record whose block starts at the offset.
+        :param offset:
+        :return Record:
+        """
+        return decode_record(self.read_payload(offset), self.strings, self.version)
+
+    def records(self):
+        """
+        Decodes all records in the order they were written.
+        :return generator of (name, Record) pairs:
+        """
+        names, offsets = self.names_and_offsets()
+        strings = self.strings
+        version = self.version
+        unpack_length = _LENGTH.unpack_from
+        with memoryview(self._map) as view:
+            for name, offset in zip(names, offsets):
+                length, = unpack_length(view, offset)
+                start = offset + _LENGTH.size
+                yield name, decode_record(view[start:start + length], strings, version)
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def is_snapshot(path: str) -> bool:
+    """
+    Tells whether the file starts like a snapshot, as opposed to an older pickled address book.
+    :param path:
+    :return bool:
+    """
+    with open(path, "rb") as file:
+        return file.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def load(path: str) -> AddressBook:
+    """
+    Reads the whole address book from a snapshot file.
+    :param path:
+    :return AddressBook:
+    """
+    contacts = AddressBook()
+    with SnapshotReader(path) as reader:
+        for name, record in reader.records():
+            contacts[name] = record
+    contacts.pop_changes()
+    return contacts
+
+
+def write(contacts: AddressBook, path: str):
+    """
+    Atomically replaces the file with a snapshot of the address book.
+    :param contacts:
+    :param path:
+    :return None:
+    """
+    replace_file(path, lambda file: dump(contacts, file))
+
+
+def dumps(contacts: AddressBook) -> bytes:
+    """
+    Encodes the address book as a snapshot in memory.
+    :param contacts:
+    :return bytes:
+    """
+    buffer = io.BytesIO()
+    dump(contacts, buffer)
+    return buffer.getvalue()
+
+
+def write_bytes(data: bytes, path: str):
+    """
+    Atomically replaces the file with a snapshot made by dumps.
+    :param data:
+    :param path:
+    :return None:
+    """
+    replace_file(path, lambda file: file.write(data))
+
+
+def replace_file(path: str, write):
+    """
+    Writes a temporary file next to the path and moves it over the path once it is complete.
+    If anything fails, the temporary file is removed and the file at the path is left as it was.
+    :param path:
+    :param write: function writing the content to the binary file it is given.
+    :return None:
+    """
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file:
+            write(file)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def migrate(path: str) -> bool:
+    """
+    Converts a pickled address book into a snapshot in place.
+    :param path:
+    :return True if the file was converted, False if it already was a snapshot:
+    """
+    if is_snapshot(path):
+        return False
+    import pickle
+    with open(path, "rb") as file:
+        contacts = pickle.load(file)
+    write(contacts, path)
+    return True
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(prog="python -m yada.snapshot",
+                                     description="Convert pickled YADA address books into snapshots.")
+    parser.add_argument("paths", nargs="*", default=["data"], help="address book files, 'data' by default")
+    options = parser.parse_args(argv)
+    for path in options.paths:
+        if migrate(path):
+            print(f"{path}: converted to snapshot version {SNAPSHOT_VERSION}.")
+        else:
+            print(f"{path}: already a snapshot.")
+
+
+if __name__ == "__main__":
+    main()
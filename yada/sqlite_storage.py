@@ -0,0 +1,741 @@
+import os
+import sqlite3
+from collections.abc import MutableMapping
+from datetime import datetime
+from itertools import groupby
+from operator import itemgetter
+
+from yada.address_book import Address, AddressBook, Birthday, Color, Email, Phone, Record, normalize_phone
+from yada.indexes import TextIndex, birthday_periods, celebration_date, day_of_year
+from yada.notebook import NOTES_FILE_NAME, Note, Notebook
+from yada.storage import Storage, read_data
+
+DATABASE_FILE_NAME = "yada.db"
+# Files of the file backend, copied into a new database once.
+CONTACTS_FILE_NAME = "data"
+# Stored in PRAGMA user_version once the files were imported, or found missing.
+_FILES_IMPORTED = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    birthday TEXT,
+    birthday_day INTEGER
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday_day ON contacts (birthday_day);
+
+CREATE TABLE IF NOT EXISTS phones (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    phone TEXT NOT NULL,
+    phone_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS phones_contact ON phones (contact_id);
+CREATE INDEX IF NOT EXISTS phones_key ON phones (phone_key);
+
+CREATE TABLE IF NOT EXISTS emails (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    email TEXT NOT NULL,
+    email_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS emails_contact ON emails (contact_id);
+CREATE INDEX IF NOT EXISTS emails_key ON emails (email_key);
+
+CREATE TABLE IF NOT EXISTS addresses (
+    contact_id INTEGER NOT NULL REFERENCES contacts (id) ON DELETE CASCADE,
+    country TEXT NOT NULL,
+    city TEXT NOT NULL,
+    street TEXT NOT NULL,
+    house_number TEXT NOT NULL,
+    country_key TEXT NOT NULL,
+    city_key TEXT NOT NULL,
+    street_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS addresses_contact ON addresses (contact_id);
+CREATE INDEX IF NOT EXISTS addresses_country ON addresses (country_key, city_key, street_key);
+CREATE INDEX IF NOT EXISTS addresses_city ON addresses (city_key, street_key);
+CREATE INDEX IF NOT EXISTS addresses_street ON addresses (street_key);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    text TEXT NOT NULL,
+    text_key TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS note_tags (
+    note_id INTEGER NOT NULL REFERENCES notes (id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    tag_key TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS note_tags_note ON note_tags (note_id);
+CREATE INDEX IF NOT EXISTS note_tags_key ON note_tags (tag_key, note_id);
+"""
+
+# Trigram full-text index over note texts, used when SQLite is built with FTS5.
+FULL_TEXT_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+    text_key, content='notes', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+    INSERT INTO notes_fts (rowid, text_key) VALUES (new.id, new.text_key);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, text_key) VALUES ('delete', old.id, old.text_key);
+END;
+CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE ON notes BEGIN
+    INSERT INTO notes_fts (notes_fts, rowid, text_key) VALUES ('delete', old.id, old.text_key);
+    INSERT INTO notes_fts (rowid, text_key) VALUES (new.id, new.text_key);
+END;
+"""
+
+# Sorts after every other character, so "prefix" <= key < "prefix" + _LAST_CHAR selects the keys starting with prefix.
+_LAST_CHAR = "\U0010ffff"
+
+
+def _parse_birthday(value):
+    try:
+        return datetime.strptime(value, "%d.%m.%Y").date()
+    except ValueError:
+        return None
+
+
+class _ChildRows:
+    """
+    Walks child rows ordered by parent id alongside their parents.
+    """
+
+    def __init__(self, cursor):
+        self._groups = groupby(cursor, key=itemgetter(0))
+        self._current = next(self._groups, None)
+
+    def take(self, parent_id):
+        """
+        Returns the rows of the parent, skipping rows of parents that were passed over.
+        :param parent_id:
+        :return list of rows without the parent id:
+        """
+        while self._current is not None and self._current[0] < parent_id:
+            self._current = next(self._groups, None)
+        if self._current is None or self._current[0] != parent_id:
+            return []
+        rows = [row[1:] for row in self._current[1]]
+        self._current = next(self._groups, None)
+        return rows
+
+
+class SQLiteStorage(Storage):
+    """
+    Keeps contacts and notes in an SQLite database with a table and indexes per field.
+    The address book and notebook it returns read rows on demand and write back only changed ones.
+    """
+
+    def __init__(self, path=DATABASE_FILE_NAME):
+        self.path = path
+        # Autosave commits from its own thread, Session.lock keeps the connection used by one thread at a time.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(FULL_TEXT_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False
+        if self.connection.execute("PRAGMA user_version").fetchone()[0] < _FILES_IMPORTED:
+            self.import_files()
+
+    def import_files(self):
+        """
+        Copies the contacts and notes of the file backend into the database, the first time it is opened.
+        Nothing is copied into a database that already has contacts or notes. The files are left as they are.
+        :return None:
+        """
+        connection = self.connection
+        contacts = notes = 0
+        if self.count_records() == 0 and self.count_notes() == 0:
+            if os.path.exists(CONTACTS_FILE_NAME):
+                for name, record in read_data(CONTACTS_FILE_NAME).items():
+                    self.write_record(name, record)
+                    contacts += 1
+            if os.path.exists(NOTES_FILE_NAME):
+                notebook = Notebook()
+                for note_id, note in notebook.notes.items():
+                    self.write_note(note_id, note)
+                    notes += 1
+                self.reserve_note_ids(notebook._next_id - 1)
+        connection.execute(f"PRAGMA user_version = {_FILES_IMPORTED}")
+        connection.commit()
+        if contacts or notes:
+            print(f"{Color.YELLOW}Imported {contacts} contacts from {CONTACTS_FILE_NAME} and {notes} notes"
+                  f" from {NOTES_FILE_NAME} into {self.path}.\n{Color.RESET}")
+
+    def load_contacts(self):
+        return SQLiteAddressBook(self)
+
+    def commit_contacts(self, contacts):
+        contacts.flush()
+        self.connection.commit()
+        contacts.pop_changes()
+
+    def load_notes(self):
+        return SQLiteNotebook(self)
+
+    def commit_notes(self, notebook):
+        notebook.save_changes()
+
+    def close(self):
+        self.connection.close()
+
+    # contacts
+
+    def _build_record(self, name, birthday, birthday_day, phones, emails, addresses):
+        record = Record(name)
+        record.phones = [Phone.from_valid(phone) for phone, in phones]
+        record.emails = [Email.from_valid(email) for email, in emails]
+        record.addresses = [Address(*address) for address in addresses]
+        if birthday is not None:
+            record.birthday = Birthday.from_valid(birthday,
+                                                  birthday=None if birthday_day is None else _parse_birthday(birthday))
+        return record
+
+    def read_record(self, name):
+        """
+        Loads one contact.
+        :param name:
+        :return Record or None:
+        """
+        row = self.connection.execute(
+            "SELECT id, birthday, birthday_day FROM contacts WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        contact_id, birthday, birthday_day = row
+        phones = self.connection.execute(
+            "SELECT phone FROM phones WHERE contact_id = ? ORDER BY rowid", (contact_id,))
+        emails = self.connection.execute(
+            "SELECT email FROM emails WHERE contact_id = ? ORDER BY rowid", (contact_id,))
+        addresses = self.connection.execute(
+            "SELECT country, city, street, house_number FROM addresses WHERE contact_id = ? ORDER BY rowid",
+            (contact_id,))
+        return self._build_record(name, birthday, birthday_day, phones, emails, addresses)
+
+    def iter_records(self):
+        """
+        Streams all contacts in insertion order, reading each table once.
+        :return (name, Record) pairs:
+        """
+        phones = _ChildRows(self.connection.execute(
+            "SELECT contact_id, phone FROM phones ORDER BY contact_id, rowid"))
+        emails = _ChildRows(self.connection.execute(
+            "SELECT contact_id, email FROM emails ORDER BY contact_id, rowid"))
+        addresses = _ChildRows(self.connection.execute(
+            "SELECT contact_id, country, city, street, house_number FROM addresses ORDER BY contact_id, rowid"))
+        contacts = self.connection.execute("SELECT id, name, birthday, birthday_day FROM contacts ORDER BY id")
+        for contact_id, name, birthday, birthday_day in contacts:
+            yield name, self._build_record(name, birthday, birthday_day, phones.take(contact_id),
+                                           emails.take(contact_id), addresses.take(contact_id))
+
+    def has_record(self, name):
+        return self.connection.execute("SELECT 1 FROM contacts WHERE name = ?", (name,)).fetchone() is not None
+
+    def record_names(self):
+        return [name for name, in self.connection.execute("SELECT name FROM contacts ORDER BY id")]
+
+    def names_with_prefix(self, prefix, limit):
+        rows = self.connection.execute("SELECT name FROM contacts WHERE name >= ? AND name < ? ORDER BY name LIMIT ?",
+                                       (prefix, prefix + _LAST_CHAR, limit))
+        return [name for name, in rows]
+
+    def count_records(self):
+        return self.connection.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def write_record(self, name, record):
+        """
+        Replaces the rows of one contact. A record of None deletes the contact.
+        :param name:
+        :param record:
+        :return None:
+        """
+        connection = self.connection
+        if record is None:
+            connection.execute("DELETE FROM contacts WHERE name = ?", (name,))
+            return
+        birthday = record.birthday.value if isinstance(record.birthday, Birthday) else None
+        birthday_date = getattr(record.birthday, "birthday", None)
+        birthday_day = None if birthday_date is None else day_of_year(birthday_date)
+        row = connection.execute("SELECT id FROM contacts WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            contact_id = connection.execute(
+                "INSERT INTO contacts (name, birthday, birthday_day) VALUES (?, ?, ?)",
+                (name, birthday, birthday_day)).lastrowid
+        else:
+            contact_id = row[0]
+            connection.execute("UPDATE contacts SET birthday = ?, birthday_day = ? WHERE id = ?",
+                               (birthday, birthday_day, contact_id))
+            for table in ("phones", "emails", "addresses"):
+                connection.execute(f"DELETE FROM {table} WHERE contact_id = ?", (contact_id,))
+        connection.executemany(
+            "INSERT INTO phones (contact_id, phone, phone_key) VALUES (?, ?, ?)",
+            [(contact_id, phone.value, normalize_phone(phone.value)) for phone in record.phones])
+        connection.executemany(
+            "INSERT INTO emails (contact_id, email, email_key) VALUES (?, ?, ?)",
+            [(contact_id, email.value, email.value.lower()) for email in record.emails])
+        connection.executemany(
+            "INSERT INTO addresses (contact_id, country, city, street, house_number, country_key, city_key,"
+            " street_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(contact_id, a.country, a.city, a.street, a.house_number, a.country.lower(), a.city.lower(),
+              a.street.lower()) for a in record.addresses])
+
+    def names_by(self, table, key_column, key):
+        """
+        Finds contacts having a phone or an email with the given key.
+        :param table: "phones" or "emails".
+        :param key_column:
+        :param key:
+        :return list of names in insertion order:
+        """
+        return [name for name, _ in self.connection.execute(
+            f"SELECT DISTINCT c.name, c.id FROM {table} t JOIN contacts c ON c.id = t.contact_id"
+            f" WHERE t.{key_column} = ? ORDER BY c.id", (key,)).fetchall()]
+
+    def names_by_birthday(self, birthday):
+        day = _parse_birthday(birthday)
+        if day is None:
+            return []
+        return [name for name, in self.connection.execute(
+            "SELECT name FROM contacts WHERE birthday_day = ? AND birthday = ? ORDER BY id",
+            (day_of_year(day), birthday))]
+
+    def names_by_birthday_days(self, first_day, last_day):
+        return self.connection.execute(
+            "SELECT name, birthday_day FROM contacts WHERE birthday_day BETWEEN ? AND ?"
+            " ORDER BY birthday_day, id", (first_day, last_day)).fetchall()
+
+    @staticmethod
+    def _address_filter(country, city, street, prefix):
+        given = [(column, value.lower()) for column, value in
+                 (("country_key", country), ("city_key", city), ("street_key", street)) if value is not None]
+        clauses, params = [], []
+        for level, (column, value) in enumerate(given):
+            if prefix and level == len(given) - 1:
+                clauses.append(f"{column} >= ? AND {column} < ?")
+                params += [value, value + _LAST_CHAR]
+            else:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        return " AND ".join(clauses) or "1", params
+
+    def names_by_address(self, country=None, city=None, street=None, prefix=False):
+        where, params = self._address_filter(country, city, street, prefix)
+        return [name for name, in self.connection.execute(
+            f"SELECT name FROM contacts WHERE id IN (SELECT contact_id FROM addresses WHERE {where}) ORDER BY id",
+            params)]
+
+    def count_by_address(self, country=None, city=None, street=None, prefix=False):
+        where, params = self._address_filter(country, city, street, prefix)
+        return self.connection.execute(
+            f"SELECT COUNT(DISTINCT contact_id) FROM addresses WHERE {where}", params).fetchone()[0]
+
+    def count_by_city(self):
+        return dict(self.connection.execute(
+            "SELECT city_key, COUNT(DISTINCT contact_id) FROM addresses GROUP BY city_key"))
+
+    # notes
+
+    def read_note(self, note_id):
+        """
+        Loads one note.
+        :param note_id:
+        :return Note or None:
+        """
+        row = self.connection.execute("SELECT text FROM notes WHERE id = ?", (note_id,)).fetchone()
+        if row is None:
+            return None
+        tags = [tag for tag, in self.connection.execute(
+            "SELECT tag FROM note_tags WHERE note_id = ? ORDER BY rowid", (note_id,))]
+        return Note(row[0], note_id, tags)
+
+    def iter_notes(self):
+        """
+        Streams all notes ordered by id.
+        :return (id, Note) pairs:
+        """
+        tags = _ChildRows(self.connection.execute("SELECT note_id, tag FROM note_tags ORDER BY note_id, rowid"))
+        for note_id, text in self.connection.execute("SELECT id, text FROM notes ORDER BY id"):
+            yield note_id, Note(text, note_id, [tag for tag, in tags.take(note_id)])
+
+    def has_note(self, note_id):
+        return self.connection.execute("SELECT 1 FROM notes WHERE id = ?", (note_id,)).fetchone() is not None
+
+    def note_ids(self):
+        return [note_id for note_id, in self.connection.execute("SELECT id FROM notes ORDER BY id")]
+
+    def count_notes(self):
+        return self.connection.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+    def next_note_id(self):
+        """
+        Returns the next note id. SQLite remembers the highest id ever used, so ids are never reused.
+        :return int:
+        """
+        row = self.connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'notes'").fetchone()
+        return (row[0] if row else 0) + 1
+
+    def reserve_note_ids(self, last_id):
+        """
+        Makes SQLite skip ids up to last_id, including those of notes deleted before they were written.
+        :param last_id:
+        :return None:
+        """
+        connection = self.connection
+        if connection.execute("UPDATE sqlite_sequence SET seq = max(seq, ?) WHERE name = 'notes'",
+                              (last_id,)).rowcount == 0:
+            connection.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('notes', ?)", (last_id,))
+
+    def write_note(self, note_id, note):
+        """
+        Replaces the rows of one note. A note of None deletes it.
+        :param note_id:
+        :param note:
+        :return None:
+        """
+        connection = self.connection
+        if note is None:
+            connection.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            return
+        connection.execute(
+            "INSERT INTO notes (id, text, text_key) VALUES (?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET text = excluded.text, text_key = excluded.text_key",
+            (note_id, note.text, note.text.lower()))
+        connection.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
+        connection.executemany("INSERT INTO note_tags (note_id, tag, tag_key) VALUES (?, ?, ?)",
+                               [(note_id, tag, tag.casefold()) for tag in note.tags])
+
+    def search_notes(self, query):
+        """
+        Finds ids of notes containing the query, ignoring case.
+        :param query:
+        :return list of ids:
+        """
+        query = query.lower()
+        if self.full_text and len(query) >= TextIndex.GRAM_SIZE:
+            rows = self.connection.execute(
+                "SELECT n.id FROM notes_fts f JOIN notes n ON n.id = f.rowid"
+                " WHERE notes_fts MATCH ? AND instr(n.text_key, ?) > 0 ORDER BY n.id",
+                ('"' + query.replace('"', '""') + '"', query))
+        else:
+            rows = self.connection.execute("SELECT id FROM notes WHERE instr(text_key, ?) > 0 ORDER BY id",
+                                           (query,))
+        return [note_id for note_id, in rows]
+
+    def note_ids_by_tags(self, tags, match_any=False):
+        keys = sorted({tag.casefold() for tag in tags})
+        if not keys:
+            return []
+        marks = ", ".join("?" * len(keys))
+        if match_any:
+            rows = self.connection.execute(
+                f"SELECT DISTINCT note_id FROM note_tags WHERE tag_key IN ({marks}) ORDER BY note_id", keys)
+        else:
+            rows = self.connection.execute(
+                f"SELECT note_id FROM note_tags WHERE tag_key IN ({marks}) GROUP BY note_id"
+                f" HAVING COUNT(DISTINCT tag_key) = ? ORDER BY note_id", keys + [len(keys)])
+        return [note_id for note_id, in rows]
+
+    def tag_counts(self):
+        return dict(self.connection.execute(
+            "SELECT tag_key, COUNT(DISTINCT note_id) FROM note_tags GROUP BY tag_key ORDER BY tag_key"))
+
+    def tags_with_prefix(self, prefix, limit):
+        rows = self.connection.execute(
+            "SELECT DISTINCT tag_key FROM note_tags WHERE tag_key >= ? AND tag_key < ? ORDER BY tag_key LIMIT ?",
+            (prefix, prefix + _LAST_CHAR, limit))
+        return [tag for tag, in rows]
+
+    def note_ids_by_tag(self):
+        rows = self.connection.execute("SELECT DISTINCT tag_key, note_id FROM note_tags ORDER BY tag_key, note_id")
+        return [(tag, [note_id for _, note_id in group]) for tag, group in groupby(rows, key=itemgetter(0))]
+
+
+_MISSING = object()
+
+
+class _CachedRows(MutableMapping):
+    """
+    Mapping over stored rows that builds objects on first access and keeps them.
+    Keys deleted but not flushed yet are hidden.
+    """
+
+    def __init__(self, owner):
+        self._owner = owner
+        self._storage = owner._storage
+        self._cache = {}
+
+    def _load(self, key):
+        raise NotImplementedError
+
+    def _exists(self, key):
+        raise NotImplementedError
+
+    def _keys(self):
+        raise NotImplementedError
+
+    def _count(self):
+        raise NotImplementedError
+
+    def _stream(self):
+        raise NotImplementedError
+
+    def _deleted(self, key):
+        return self._owner._pending.get(key, _MISSING) is None
+
+    def __getitem__(self, key):
+        item = self._cache.get(key)
+        if item is not None:
+            return item
+        if self._deleted(key):
+            raise KeyError(key)
+        item = self._load(key)
+        if item is None:
+            raise KeyError(key)
+        self._attach(item)
+        self._cache[key] = item
+        return item
+
+    def _attach(self, item):
+        raise NotImplementedError
+
+    def __setitem__(self, key, item):
+        self._cache[key] = item
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self._cache.pop(key, None)
+
+    def __contains__(self, key):
+        if key in self._cache:
+            return True
+        if self._deleted(key):
+            return False
+        return self._exists(key)
+
+    def __len__(self):
+        self._owner.flush()
+        return self._count()
+
+    def __iter__(self):
+        self._owner.flush()
+        return iter(self._keys())
+
+    def items(self):
+        """
+        Streams all items without keeping the ones that were not loaded before.
+        """
+        self._owner.flush()
+        for key, item in self._stream():
+            cached = self._cache.get(key)
+            if cached is None:
+                self._attach(item)
+                cached = item
+            yield key, cached
+
+    def values(self):
+        for _, item in self.items():
+            yield item
+
+
+class _SQLiteRecords(_CachedRows):
+
+    def _load(self, name):
+        return self._storage.read_record(name)
+
+    def _exists(self, name):
+        return self._storage.has_record(name)
+
+    def _keys(self):
+        return self._storage.record_names()
+
+    def _count(self):
+        return self._storage.count_records()
+
+    def _stream(self):
+        return self._storage.iter_records()
+
+    def _attach(self, record):
+        record.book = self._owner
+
+
+class _SQLiteNotes(_CachedRows):
+
+    def _load(self, note_id):
+        return self._storage.read_note(note_id)
+
+    def _exists(self, note_id):
+        return self._storage.has_note(note_id)
+
+    def _keys(self):
+        return self._storage.note_ids()
+
+    def _count(self):
+        return self._storage.count_notes()
+
+    def _stream(self):
+        return self._storage.iter_notes()
+
+    def _attach(self, note):
+        note.notebook = self._owner
+
+
+class SQLiteAddressBook(AddressBook):
+    """
+    Address book backed by SQLite. Records are loaded when first used,
+    and lookups are answered by the database indexes.
+    Changes are written to the open transaction before every query and committed by the storage.
+    """
+
+    def __init__(self, storage: SQLiteStorage):
+        self._storage = storage
+        self._pending = {}
+        super().__init__()
+        self.data = _SQLiteRecords(self)
+
+    def __getstate__(self):
+        raise TypeError("SQLite address book is saved by its storage")
+
+    def _index_record(self, record):
+        pass
+
+    def _unindex_record(self, record):
+        pass
+
+    def _mark_changed(self, name, record):
+        super()._mark_changed(name, record)
+        self._pending[name] = record
+
+    def flush(self):
+        """
+        Writes the changed records to the database without committing.
+        :return None:
+        """
+        for name, record in self._pending.items():
+            self._storage.write_record(name, record)
+        self._pending = {}
+
+    def items(self):
+        return self.data.items()
+
+    def values(self):
+        return self.data.values()
+
+    def _all_names(self):
+        self.flush()
+        return self._storage.record_names()
+
+    def complete_names(self, prefix: str, limit: int):
+        self.flush()
+        return self._storage.names_with_prefix(prefix.lower(), limit)
+
+    def find_by_phone(self, phone: str):
+        self.flush()
+        names = self._storage.names_by("phones", "phone_key", normalize_phone(phone))
+        return self.data[names[0]] if names else None
+
+    def find_by_email(self, email):
+        self.flush()
+        return [self.data[name] for name in self._storage.names_by("emails", "email_key", email.lower())]
+
+    def find_by_birthday(self, birthday: str):
+        self.flush()
+        return [self.data[name] for name in self._storage.names_by_birthday(birthday)]
+
+    def upcoming_birthdays(self, days: int, today=None):
+        self.flush()
+        result = []
+        seen = set()
+        for year, first_day, last_day in birthday_periods(today or datetime.today().date(), days):
+            for name, day in self._storage.names_by_birthday_days(first_day, last_day):
+                if name not in seen:
+                    seen.add(name)
+                    result.append((celebration_date(year, day), self.data[name]))
+        return result
+
+    def find_by_address(self, city=None, street=None, country=None, prefix=False):
+        self.flush()
+        return [self.data[name] for name in self._storage.names_by_address(country, city, street, prefix)]
+
+    def count_by_address(self, city=None, street=None, country=None, prefix=False):
+        self.flush()
+        return self._storage.count_by_address(country, city, street, prefix)
+
+    def count_by_city(self):
+        self.flush()
+        return self._storage.count_by_city()
+
+
+class SQLiteNotebook(Notebook):
+    """
+    Notebook backed by SQLite. Notes are loaded when first used and searched with SQL,
+    using the trigram full-text index when it is available.
+    """
+
+    def __init__(self, storage: SQLiteStorage):
+        self._storage = storage
+        self._pending = {}
+        super().__init__()
+        self.notes = _SQLiteNotes(self)
+
+    def load_notes(self):
+        self._next_id = self._storage.next_note_id()
+
+    def save_notes(self):
+        self.flush()
+        self._storage.connection.commit()
+        self.pop_changes()
+
+    def mark_changed(self, note_id, note=None):
+        super().mark_changed(note_id, note)
+        self._pending[note_id] = note
+
+    def flush(self):
+        """
+        Writes the changed notes to the database without committing.
+        :return None:
+        """
+        if not self._pending:
+            return
+        for note_id, note in self._pending.items():
+            self._storage.write_note(note_id, note)
+        self._storage.reserve_note_ids(self._next_id - 1)
+        self._pending = {}
+
+    def _index_note(self, note):
+        pass
+
+    def _unindex_note(self, note):
+        pass
+
+    def _tag_added(self, note, tag):
+        self.mark_changed(note.id, note)
+
+    def _tag_deleted(self, note, tag):
+        self.mark_changed(note.id, note)
+
+    def search_text(self, query):
+        self.flush()
+        return [self.notes[note_id] for note_id in self._storage.search_notes(query)]
+
+    def search_tags(self, tags, match_any=False):
+        self.flush()
+        return [self.notes[note_id] for note_id in self._storage.note_ids_by_tags(tags, match_any)]
+
+    def complete_tags(self, prefix, limit):
+        self.flush()
+        return self._storage.tags_with_prefix(prefix.casefold(), limit)
+
+    def tag_counts(self):
+        self.flush()
+        return self._storage.tag_counts()
+
+    def notes_by_tags(self):
+        self.flush()
+        return [(tag, [self.notes[note_id] for note_id in note_ids])
+                for tag, note_ids in self._storage.note_ids_by_tag()]
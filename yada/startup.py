@@ -0,0 +1,93 @@
+import builtins
+import sys
+import time
+from contextlib import contextmanager
+
+
+class StartupReport:
+    """
+    Measures where the time goes before the assistant is ready for a command.
+    Keeps the duration of named phases and, once trace_imports is called,
+    the time of every module imported for the first time, like "python -X importtime".
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self.phases = []
+        self.imports = []
+        self._children = []
+        self._original_import = None
+
+    def mark(self, phase: str):
+        """
+        Records the time passed since the previous mark as the given phase.
+        :param phase:
+        :return None:
+        """
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last_mark))
+        self._last_mark = now
+
+    @contextmanager
+    def measure(self, phase: str):
+        """
+        Records the time spent in the block as the given phase.
+        :param phase:
+        :return None:
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((phase, time.perf_counter() - start))
+            self._last_mark = time.perf_counter()
+
+    def trace_imports(self):
+        """
+        Starts timing the imports of modules that are not loaded yet.
+        :return None:
+        """
+        if self._original_import is not None:
+            return
+        original_import = self._original_import = builtins.__import__
+        imports = self.imports
+        children = self._children
+
+        def timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+            if level or name in sys.modules:
+                return original_import(name, globals, locals, fromlist, level)
+            depth = len(children)
+            children.append(0.0)
+            start = time.perf_counter()
+            try:
+                return original_import(name, globals, locals, fromlist, level)
+            finally:
+                cumulative = time.perf_counter() - start
+                nested = children.pop()
+                if children:
+                    children[-1] += cumulative
+                imports.append((depth, cumulative - nested, cumulative, name))
+
+        builtins.__import__ = timed_import
+
+    def stop_tracing(self):
+        if self._original_import is not None:
+            builtins.__import__ = self._original_import
+            self._original_import = None
+
+    def print_report(self, file=None):
+        """
+        Prints the import times and the phases to the standard error.
+        :param file:
+        :return None:
+        """
+        file = file or sys.stderr
+        if self.imports:
+            print("import time: self [us] | cumulative | imported package", file=file)
+            for depth, own, cumulative, name in self.imports:
+                print(f"import time: {own * 1e6:9.0f} | {cumulative * 1e6:10.0f} | {'  ' * depth}{name}", file=file)
+        print("startup phase                 time [ms]", file=file)
+        for phase, seconds in self.phases:
+            print(f"  {phase:<28}{seconds * 1e3:9.1f}", file=file)
+        print(f"  {'total':<28}{(time.perf_counter() - self.started) * 1e3:9.1f}", file=file)
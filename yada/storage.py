@@ -0,0 +1,170 @@
+from yada.address_book import AddressBook
+from yada.exceptions import open_file_error
+from yada.journal import commit_journal, prepare_journal, replay_journal, write_snapshot
+from yada.notebook import Notebook
+
+
+def read_data(path="data"):
+    """
+    Read users from the given snapshot file and apply the changes journaled after it.
+    By default, path = "data".
+    :param path:
+    :return AddressBook:
+    """
+    contacts = read_snapshot(path)
+    replay_journal(contacts, path)
+    return contacts
+
+
+@open_file_error
+def read_snapshot(path="data"):
+    """
+    Read users from the given snapshot file.
+    Files written by older versions, which pickled the address book, are still read with "pickle"
+    and are replaced by a snapshot on the next compaction or by "python -m yada.snapshot".
+    By default, path = "data".
+    :param path:
+    :return AddressBook:
+    """
+    from yada import snapshot
+    if snapshot.is_snapshot(path):
+        return snapshot.load(path)
+    import pickle
+    with open(path, "rb") as file:
+        unpacked = pickle.load(file)
+    return unpacked
+
+
+def write_data(contacts: AddressBook, path="data"):
+    """
+    Write all contacts to the given snapshot file, folding in the journal.
+    By default path = "data".
+    :param contacts:
+    :param path:
+    :return  None:
+    """
+    write_snapshot(contacts, path)
+    contacts.pop_changes()
+
+
+class PendingWrite:
+    """
+    File writes of a commit, prepared under the session lock and run after it is released.
+    `write` touches only the files; `undo` puts the changes back into the book when the write fails
+    and is run under the lock.
+    """
+
+    def __init__(self, write, undo):
+        self.write = write
+        self.undo = undo
+
+
+class Storage:
+    """
+    Base class for the places where contacts and notes are kept.
+    """
+
+    def load_contacts(self) -> AddressBook:
+        raise NotImplementedError
+
+    def commit_contacts(self, contacts: AddressBook):
+        """
+        Persists the changes made to the address book since the last commit.
+        """
+        raise NotImplementedError
+
+    def prepare_contacts(self, contacts: AddressBook):
+        """
+        Takes the changes made to the address book since the last commit, for writing without the session lock.
+        Backends that can't write apart from the book commit right away.
+        :return PendingWrite, or None if there is nothing left to write:
+        """
+        self.commit_contacts(contacts)
+        return None
+
+    def load_notes(self) -> Notebook:
+        raise NotImplementedError
+
+    def commit_notes(self, notebook: Notebook):
+        """
+        Persists the changes made to the notebook since the last commit.
+        """
+        raise NotImplementedError
+
+    def prepare_notes(self, notebook: Notebook):
+        """
+        Takes the changes made to the notebook since the last commit, for writing without the session lock.
+        Backends that can't write apart from the notebook commit right away.
+        :return PendingWrite, or None if there is nothing left to write:
+        """
+        self.commit_notes(notebook)
+        return None
+
+    def close(self):
+        pass
+
+
+class FileStorage(Storage):
+    """
+    Keeps contacts in a binary snapshot with a journal and notes in a text file.
+    With lazy_contacts the snapshot is memory-mapped and records are decoded on demand,
+    with lazy_notes the same is done for the notes file.
+    """
+
+    def __init__(self, path="data", lazy_notes=False, lazy_contacts=False):
+        self.path = path
+        self.lazy_notes = lazy_notes
+        self.lazy_contacts = lazy_contacts
+
+    def load_contacts(self):
+        if self.lazy_contacts:
+            from yada.mapped_contacts import read_lazy_data
+            return read_lazy_data(self.path)
+        return read_data(self.path)
+
+    def commit_contacts(self, contacts):
+        commit_journal(contacts, self.path)
+
+    def prepare_contacts(self, contacts):
+        changes = contacts.pop_changes()
+        if not changes:
+            return None
+        try:
+            write = prepare_journal(contacts, changes, self.path)
+        except Exception:
+            contacts.restore_changes(changes)
+            raise
+        return PendingWrite(write, lambda: contacts.restore_changes(changes))
+
+    def load_notes(self):
+        if self.lazy_notes:
+            from yada.mapped_notes import LazyNotebook
+            return LazyNotebook()
+        return Notebook()
+
+    def commit_notes(self, notebook):
+        notebook.save_changes()
+
+    def prepare_notes(self, notebook):
+        if not notebook.dirty:
+            return None
+        write = notebook.notes_writer()
+        changes = notebook.pop_changes()
+        return PendingWrite(write, lambda: notebook.restore_changes(changes))
+
+
+STORAGE_NAMES = ("file", "sqlite")
+
+
+def get_storage(name="file", lazy_notes=False, lazy_contacts=False):
+    """
+    Creates the storage backend with the given name.
+    :param name: "file" or "sqlite".
+    :param lazy_notes: Load notes from the notes file on demand, used by the "file" backend.
+    :param lazy_contacts: Load contacts from the snapshot on demand, used by the "file" backend.
+    :return Storage:
+    """
+    if name == "sqlite":
+        from yada.sqlite_storage import SQLiteStorage
+        return SQLiteStorage()
+    return FileStorage(lazy_notes=lazy_notes, lazy_contacts=lazy_contacts)
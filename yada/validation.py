@@ -0,0 +1,99 @@
+import re
+from datetime import date
+
+PHONE_PATTERN = re.compile(r"^\d{10}$")
+EMAIL_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
+BIRTHDAY_PATTERN = re.compile(r"^(\d{2})\.(\d{2})\.(\d{4})$")
+
+PHONE_MESSAGE = "Phone number must be 10 digits long."
+EMAIL_MESSAGE = "Invalid email address."
+BIRTHDAY_MESSAGE = "Birthday date must be in this format 'DD.MM.YYYY'."
+
+
+class ValidationError(ValueError):
+    """
+    Raised when a phone, email or birthday has the wrong format.
+    Keeps the field name, the rejected value and, in validate_many, its position.
+    """
+
+    def __init__(self, field: str, value, message: str, index=None):
+        super().__init__(message)
+        self.field = field
+        self.value = value
+        self.message = message
+        self.index = index
+
+
+def normalize_phone(phone: str) -> str:
+    """
+    Returns the phone number without the optional "+38" country prefix.
+    :param phone:
+    :return normalized phone number:
+    """
+    return phone[3:] if phone.startswith('+38') else phone
+
+
+def validate_phone(value: str) -> str:
+    """
+    Checks that the phone number has 10 digits, with an optional "+38" prefix.
+    :param value:
+    :return the phone number as given:
+    """
+    if not PHONE_PATTERN.match(normalize_phone(value)):
+        raise ValidationError("phone", value, PHONE_MESSAGE)
+    return value
+
+
+def validate_email(value: str) -> str:
+    """
+    Checks the email address against EMAIL_PATTERN.
+    :param value:
+    :return the email address as given:
+    """
+    if not EMAIL_PATTERN.match(value):
+        raise ValidationError("email", value, EMAIL_MESSAGE)
+    return value
+
+
+def validate_birthday(value: str) -> date:
+    """
+    Checks that the birthday is an existing date in DD.MM.YYYY format.
+    :param value:
+    :return the date:
+    """
+    match = BIRTHDAY_PATTERN.match(value)
+    if match is None:
+        raise ValidationError("birthday", value, BIRTHDAY_MESSAGE)
+    day, month, year = match.groups()
+    try:
+        return date(int(year), int(month), int(day))
+    except ValueError:
+        raise ValidationError("birthday", value, BIRTHDAY_MESSAGE) from None
+
+
+VALIDATORS = {
+    "phone": validate_phone,
+    "email": validate_email,
+    "birthday": validate_birthday,
+}
+
+
+def validate_many(field: str, values) -> tuple:
+    """
+    Validates a whole column of values of one field without printing anything.
+    :param field: "phone", "email" or "birthday".
+    :param values: iterable of strings.
+    :return (results, errors): results holds the validated value or None for every input value,
+    errors holds a ValidationError with its index for every rejected value.
+    """
+    validator = VALIDATORS[field]
+    results = []
+    errors = []
+    for index, value in enumerate(values):
+        try:
+            results.append(validator(value))
+        except ValidationError as error:
+            error.index = index
+            results.append(None)
+            errors.append(error)
+    return results, errors